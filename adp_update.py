@@ -0,0 +1,220 @@
+from collections import deque
+
+import numpy as np
+
+# ==========================================
+# MOTOR DE ATUALIZAÇÃO DO ADP
+# ==========================================
+# Substitui o laço O(H²) do V_hat e o LinearRegression do sklearn por
+# operações NumPy sobre uma matriz 6x6 mantida entre as iterações.
+
+UPDATE_MODES = ('alpha', 'rls', 'batch')
+STEP_RULES = ('constant', 'harmonic', 'stc', 'kesten')
+
+
+def discounted_returns(step_costs, gamma):
+    """V_hat[t] = soma_{k>=t} gamma^(k-t) * custo[k], numa única passada reversa."""
+    v_hat = np.empty(len(step_costs))
+    acc = 0.0
+    for t in range(len(step_costs) - 1, -1, -1):
+        acc = step_costs[t] + gamma * acc
+        v_hat[t] = acc
+    return v_hat
+
+
+class StepSize:
+    """
+    Passo alpha_n do modo 'alpha' (n = número da atualização, a partir de 1):
+      - 'constant': alpha;
+      - 'harmonic': a / (a + n - 1);
+      - 'stc':      search-then-converge, alpha0 * (b/n + a) / (b/n + a + n^beta):
+                    passo quase constante no início, depois cai como n^-beta;
+      - 'kesten':   a / (a + K - 1), com K - 1 o número de vezes em que o erro
+                    (coeficientes do dia - zetas) trocou de sentido: o passo só
+                    cai quando os zetas passam a oscilar em torno do alvo.
+    Nenhum passo fica abaixo de `alpha_min`.
+    """
+
+    DEFAULTS = {
+        'constant': {},
+        'harmonic': {'a': 100.0},
+        'stc': {'alpha0': 1.0, 'a': 10.0, 'b': 1000.0, 'beta': 0.7},
+        'kesten': {'a': 100.0},
+    }
+
+    def __init__(self, rule='constant', alpha=0.01, alpha_min=0.0, n=0, k=1, **params):
+        if rule not in STEP_RULES:
+            raise ValueError(f"Regra de passo desconhecida: {rule}")
+        self.rule = rule
+        self.alpha = alpha
+        self.alpha_min = alpha_min
+        self.params = dict(self.DEFAULTS[rule], **params)
+        self.n = n            # Atualizações já feitas (retomar o treino continua a sequência)
+        self.k = k            # Kesten: 1 + trocas de sentido do erro
+        self._last_error = None
+
+    def next(self, error=None):
+        self.n += 1
+        p = self.params
+        if self.rule == 'constant':
+            step = self.alpha
+        elif self.rule == 'harmonic':
+            step = p['a'] / (p['a'] + self.n - 1)
+        elif self.rule == 'stc':
+            b_n = p['b'] / self.n
+            step = p['alpha0'] * (b_n + p['a']) / (b_n + p['a'] + self.n ** p['beta'])
+        else:
+            if error is not None:
+                if self._last_error is not None and float(np.dot(error, self._last_error)) < 0:
+                    self.k += 1
+                self._last_error = np.array(error, dtype=float)
+            step = p['a'] / (p['a'] + self.k - 1)
+        return max(self.alpha_min, step)
+
+
+class ConvergenceMonitor:
+    """
+    Janela móvel das últimas `window` atualizações, comparando a primeira
+    metade com a segunda (médias: o ruído de cada dia se cancela). Convergiu
+    quando, após `min_iterations`:
+      - a deriva da média dos zetas, |média2 - média1| / max(1, |média2|),
+        fica abaixo de `tol`. Só contam os zetas de `features`: bias e tempo
+        são constantes dentro da época e não mudam nenhuma decisão;
+      - a mediana do resíduo da regressão (caudas pesadas: dias com multa)
+        muda menos que `residual_tol`, em termos relativos.
+    """
+
+    def __init__(self, window=1000, tol=0.01, residual_tol=0.05, min_iterations=2000,
+                 features=(1, 2, 3, 4)):
+        self.window = window
+        self.features = list(features)
+        self.tol = tol
+        self.residual_tol = residual_tol
+        self.min_iterations = min_iterations
+        self.zetas = deque(maxlen=window)
+        self.residuals = deque(maxlen=window)
+        self.iterations = 0
+
+    def seed(self, history):
+        """Recompõe a janela de zetas a partir do histórico (ao retomar o treino)."""
+        for z in history[-self.window:]:
+            self.zetas.append(np.array(z, dtype=float))
+        self.iterations = len(history)
+
+    def update(self, zetas, residual=None):
+        self.iterations += 1
+        self.zetas.append(np.array(zetas, dtype=float))
+        if residual is not None:
+            self.residuals.append(residual)
+
+    def drift(self):
+        if len(self.zetas) < self.window:
+            return None
+        z = np.array(self.zetas)[:, self.features]
+        half = self.window // 2
+        first, second = z[:half].mean(axis=0), z[half:].mean(axis=0)
+        return float(np.linalg.norm(second - first) / max(1.0, np.linalg.norm(second)))
+
+    def residual_change(self):
+        if len(self.residuals) < self.window:
+            return None
+        r = np.array(self.residuals)
+        half = self.window // 2
+        first, second = np.median(r[:half]), np.median(r[half:])
+        return float(abs(second - first) / max(abs(first), 1e-12))
+
+    @property
+    def converged(self):
+        if self.tol is None or self.iterations < self.min_iterations:
+            return False
+        drift, change = self.drift(), self.residual_change()
+        return (drift is not None and drift <= self.tol and
+                change is not None and change <= self.residual_tol)
+
+    def status(self):
+        drift, change = self.drift(), self.residual_change()
+        return {'drift': None if drift is None else round(drift, 6),
+                'residual': round(float(self.residuals[-1]), 4) if self.residuals else None,
+                'residual_change': None if change is None else round(change, 6)}
+
+
+class ZetaUpdater:
+    """
+    Atualiza os zetas a partir das amostras (features, V_hat) de um ou mais dias.
+
+    Modos:
+      - 'alpha': mínimos quadrados do dia + suavização (1-alpha)*z + alpha*coef,
+                 como o treino original; com `step` (StepSize), alpha muda a
+                 cada atualização;
+      - 'rls':   mínimos quadrados recursivos em bloco, com fator de
+                 esquecimento `forgetting` por atualização (1.0 = sem esquecer);
+      - 'batch': acumula as equações normais de todas as amostras e refaz o
+                 ajuste completo a cada `refit_every` atualizações.
+    Depois de cada update, `last_alpha` é o passo usado (modo 'alpha') e
+    `last_residual` o RMS de X @ zetas_novos - V_hat nas amostras do lote.
+    """
+
+    def __init__(self, zetas, mode='alpha', alpha=0.01, forgetting=0.999,
+                 delta=1e3, refit_every=1, step=None):
+        if mode not in UPDATE_MODES:
+            raise ValueError(f"Modo de atualização desconhecido: {mode}")
+        self.mode = mode
+        self.alpha = alpha
+        self.forgetting = forgetting
+        self.refit_every = refit_every
+        self.step = step
+        self.updates = 0
+        self.last_alpha = None
+        self.last_residual = None
+
+        n = len(zetas)
+        if mode == 'rls':
+            # Prior P0 = delta*I centrado nos zetas atuais.
+            self.R = np.eye(n) / delta
+            self.r = self.R @ np.asarray(zetas, dtype=float)
+        else:
+            self.R = np.zeros((n, n))
+            self.r = np.zeros(n)
+
+    def update(self, zetas, feats, v_hat):
+        """Retorna os novos zetas dadas as amostras de um lote."""
+        X = np.asarray(feats, dtype=float)
+        y = np.asarray(v_hat, dtype=float)
+        self.updates += 1
+        new = self._update(zetas, X, y)
+        self.last_residual = float(np.sqrt(np.mean((X @ new - y) ** 2))) if len(y) else None
+        return new
+
+    def state(self):
+        """Acumuladores R, r dos modos 'rls' e 'batch' (None no modo 'alpha')."""
+        if self.mode == 'alpha':
+            return None
+        return {'mode': self.mode, 'R': self.R.copy(), 'r': self.r.copy()}
+
+    def restore(self, state):
+        """Retoma os acumuladores salvos por state(); ignora os de outro modo."""
+        if state is None or self.mode == 'alpha' or state['mode'] != self.mode:
+            return False
+        if np.shape(state['R']) != self.R.shape or np.shape(state['r']) != self.r.shape:
+            return False
+        self.R = np.array(state['R'], dtype=float)
+        self.r = np.array(state['r'], dtype=float)
+        return True
+
+    def _update(self, zetas, X, y):
+        if self.mode == 'alpha':
+            coef = np.linalg.lstsq(X, y, rcond=None)[0]
+            alpha = self.step.next(coef - zetas) if self.step is not None else self.alpha
+            self.last_alpha = alpha
+            return (1 - alpha) * zetas + alpha * coef
+
+        if self.mode == 'rls':
+            self.R = self.forgetting * self.R + X.T @ X
+            self.r = self.forgetting * self.r + X.T @ y
+            return np.linalg.solve(self.R, self.r)
+
+        self.R += X.T @ X
+        self.r += X.T @ y
+        if self.updates % self.refit_every:
+            return zetas
+        return np.linalg.lstsq(self.R, self.r, rcond=None)[0]
@@ -0,0 +1,147 @@
+import numpy as np
+
+# ==========================================
+# SOLVER COMBINATÓRIO EXATO (VFA LINEAR)
+# ==========================================
+# Com a VFA linear de seis features, o objetivo do MILP se separa por par
+# (carregador, VE) conectado:
+#
+#   obj = constante + soma_{pares} [ z1 - z2 - z4*urg_j + (preço - z3)*e_ij ]
+#
+# onde e_ij = min(P_i*tau/60, d_j) se preço < z3 e 0 caso contrário (a taxa
+# ótima é sempre "tudo ou nada"). A decisão vira um problema de atribuição
+# entre conectores e VEs, resolvido exatamente pelo método húngaro.
+
+
+def ev_terms(evs, current_epoch):
+    """
+    Dados por VE usados pelos modelos de decisão: demanda restante, urgência
+    1/(partida - t) e a lista ordenada de candidatos (demanda > 0.001).
+    IDs repetidos viram um único candidato, como no MILP completo.
+    """
+    need = {}
+    urg = {}
+    for ev in evs:
+        need.setdefault(ev.id, ev.current_energy_needed)
+        u = 1.0 / (ev.departure_time - current_epoch) if ev.departure_time > current_epoch else 0.0
+        urg[ev.id] = urg.get(ev.id, 0.0) + u
+
+    cands = list(dict.fromkeys(ev.id for ev in evs if ev.current_energy_needed > 0.001))
+    return need, urg, cands
+
+
+def constant_terms(evs, urg, chargers, current_epoch, tau=15, constants=None):
+    """
+    (conectores, demanda total, urgência total, tempo) da parte constante do
+    objetivo. Com `constants` (FeatureState.solver_constants), os agregados
+    mantidos por eventos são usados sem varrer os VEs.
+    """
+    if constants is not None:
+        return (constants['n_slots'], constants['total_need'], constants['total_urgency'],
+                constants['time'])
+    return (sum(c.num_connectors for c in chargers),
+            sum(ev.current_energy_needed for ev in evs),
+            sum(urg.values()),
+            (current_epoch * tau) / (96 * tau))
+
+
+def prune_dominated(cands, need, urg, n_slots, energy_price, zetas):
+    """
+    Remove candidatos que nunca entram numa solução ótima.
+
+    O valor de conectar j é  z1 - z2 - z4*urg_j + (preço - z3)*e_j,
+    com e_j crescente na demanda (e irrelevante se preço >= z3).
+    Se j' é dominado (urgência e demanda no máximo iguais, com desempate
+    pela ordem) por pelo menos `n_slots` outros VEs, em qualquer solução
+    que o conecte há um dominante livre para trocar sem piorar o objetivo.
+    """
+    if len(cands) <= n_slots:
+        return cands
+
+    cost = -zetas[4] * np.array([urg[j] for j in cands])   # menor é melhor
+    if energy_price - zetas[3] < 0:
+        gain = np.array([need[j] for j in cands])          # maior é melhor
+    else:
+        gain = np.zeros(len(cands))
+
+    order = np.arange(len(cands))
+    weak = (cost[:, None] <= cost[None, :]) & (gain[:, None] >= gain[None, :])
+    strict = (cost[:, None] < cost[None, :]) | (gain[:, None] > gain[None, :])
+    # dominates[a, b]: a domina b
+    dominates = weak & (strict | (order[:, None] < order[None, :]))
+    n_dominators = dominates.sum(axis=0)
+
+    return [j for j, n in zip(cands, n_dominators) if n < n_slots]
+
+
+def solve_assignment(evs, chargers, current_epoch, energy_price, zetas, tau=15, constants=None):
+    """
+    Mesma entrada/saída de solve_decision_model, sem Pyomo nem GLPK.
+    Retorna (decisões, valor do objetivo).
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    h = tau / 60.0
+    need, urg, cands = ev_terms(evs, current_epoch)
+    n_slots = sum(c.num_connectors for c in chargers)
+    if not cands or n_slots == 0:
+        return [], 0.0
+
+    cands = prune_dominated(cands, need, urg, n_slots, energy_price, zetas)
+
+    # Parte constante do objetivo (nenhum VE conectado)
+    _, total_dem, total_urg, f_time = constant_terms(evs, urg, chargers, current_epoch, tau, constants)
+    base = (zetas[0] +
+            zetas[2]*n_slots +
+            zetas[3]*total_dem +
+            zetas[4]*total_urg +
+            zetas[5]*f_time)
+
+    # Uma linha por conector físico, uma coluna por VE candidato
+    slot_charger = [c for c in chargers for _ in range(c.num_connectors)]
+    slot_k = [k for c in chargers for k in range(c.num_connectors)]
+    slot_power = np.array([c.max_power for c in slot_charger])
+
+    cand_need = np.array([need[j] for j in cands])
+    cand_urg = np.array([urg[j] for j in cands])
+
+    slope = energy_price - zetas[3]
+    if slope < 0:
+        energy = np.minimum(slot_power[:, None] * h, cand_need[None, :])
+    else:
+        energy = np.zeros((n_slots, len(cands)))
+    value = zetas[1] - zetas[2] - zetas[4]*cand_urg[None, :] + slope*energy
+
+    # Pares com valor >= 0 equivalem a deixar o conector livre.
+    rows, cols = linear_sum_assignment(np.minimum(value, 0.0))
+
+    decisions = []
+    obj = base
+    for r, c in zip(rows, cols):
+        if value[r, c] < 0:
+            decisions.append({
+                'charger_id': slot_charger[r].id, 'connector_id': slot_k[r],
+                'ev_id': cands[c], 'charge_rate': float(energy[r, c] / h)
+            })
+            obj += value[r, c]
+
+    return decisions, float(obj)
+
+
+def evaluate_decisions(decisions, evs, chargers, current_epoch, energy_price, zetas, tau=15,
+                       constants=None):
+    """Objetivo do modelo completo (solve_decision_model) para uma decisão dada."""
+    h = tau / 60.0
+    _, urg, _ = ev_terms(evs, current_epoch)
+    n_slots, total_dem, total_urg, f_time = constant_terms(evs, urg, chargers, current_epoch,
+                                                           tau, constants)
+    delivered = sum(d['charge_rate'] for d in decisions) * h
+    connected = {d['ev_id'] for d in decisions}
+    n_conn = len(decisions)
+    return (energy_price * delivered +
+            zetas[0] +
+            zetas[1] * n_conn +
+            zetas[2] * (n_slots - n_conn) +
+            zetas[3] * (total_dem - delivered) +
+            zetas[4] * (total_urg - sum(urg[j] for j in connected)) +
+            zetas[5] * f_time)
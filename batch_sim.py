@@ -0,0 +1,260 @@
+import time
+
+import numpy as np
+
+import main
+from classes import EV, Charger
+from solver import solve_decision_model
+from main import HORIZON, TAU, PRICES, PENALTY, get_base_scenario
+
+# ==========================================
+# SIMULADOR EM LOTE (STRUCT-OF-ARRAYS)
+# ==========================================
+# Cada episódio (dia) ocupa uma linha das matrizes de estado. As colunas são
+# "slots" fixos de VEs: primeiro os VEs do cenário base, depois um slot por
+# época para a chegada daquela época (no máximo uma chegada por época, como
+# em run_day). A ordem dos slots reproduz a ordem da lista `evs` de run_day,
+# o que mantém o desempate das heurísticas idêntico. Os IDs das chegadas são
+# os mesmos de run_day (100 + época), então os dias de treino coincidem.
+
+TEST_ARRIVAL_EPOCH = 68  # Chegada fixa do dia de teste (17:00)
+
+
+class FleetState:
+    """Estado da frota para N dias paralelos, em arrays NumPy."""
+
+    def __init__(self, n_episodes, base_evs, chargers):
+        n_base = len(base_evs)
+        shape = (n_episodes, n_base + HORIZON)
+
+        self.n_episodes = n_episodes
+        self.n_base = n_base
+
+        self.ids = np.zeros(shape, dtype=np.int64)
+        self.arrival = np.zeros(shape, dtype=np.int64)
+        self.departure = np.zeros(shape, dtype=np.int64)
+        self.required = np.zeros(shape)
+        self.needed = np.zeros(shape)
+        self.present = np.zeros(shape, dtype=bool)
+        self.assigned = np.zeros(shape, dtype=bool)
+
+        for s, ev in enumerate(base_evs):
+            self.ids[:, s] = ev.id
+            self.arrival[:, s] = ev.arrival_time
+            self.departure[:, s] = ev.departure_time
+            self.required[:, s] = ev.required_energy
+            self.needed[:, s] = ev.current_energy_needed
+            self.present[:, s] = True
+
+        # Carregadores são iguais em todos os episódios; só a ocupação varia.
+        self.charger_ids = np.array([c.id for c in chargers])
+        self.max_power = np.array([c.max_power for c in chargers])
+        self.num_connectors = np.array([c.num_connectors for c in chargers])
+        self.is_level_3 = np.array([c.is_level_3 for c in chargers])
+        self.connected = np.zeros((n_episodes, len(chargers)), dtype=np.int64)
+
+    def add_arrivals(self, t, mask, ev_id, departure, energy):
+        """Insere a chegada da época t nos episódios marcados em `mask`."""
+        s = self.n_base + t
+        self.ids[mask, s] = ev_id
+        self.arrival[mask, s] = t
+        self.departure[mask, s] = departure
+        self.required[mask, s] = energy
+        self.needed[mask, s] = energy
+        self.present[mask, s] = True
+
+    def features(self, t):
+        """Versão vetorizada de FeatureExtractor.get_basis_functions."""
+        n = self.n_episodes
+        phi = np.empty((n, 6))
+        phi[:, 0] = 1.0
+        phi[:, 1] = (self.present & self.assigned).sum(axis=1)
+        phi[:, 2] = (self.num_connectors - self.connected).sum(axis=1)
+        phi[:, 3] = np.where(self.present, self.needed, 0.0).sum(axis=1)
+
+        waiting = self.present & ~self.assigned & (self.departure > t)
+        time_rem = np.maximum(self.departure - t, 0.1)
+        phi[:, 4] = np.where(waiting, 1.0 / time_rem, 0.0).sum(axis=1)
+
+        phi[:, 5] = (t * TAU) / (96 * TAU)
+        return phi
+
+    def materialize(self, e):
+        """Reconstrói as listas de EV/Charger do episódio e (para o MILP)."""
+        evs = []
+        slots = {}
+        for s in np.flatnonzero(self.present[e]):
+            ev = EV(int(self.ids[e, s]), int(self.arrival[e, s]),
+                    int(self.departure[e, s]), float(self.required[e, s]),
+                    float(self.needed[e, s]))
+            evs.append(ev)
+            slots[ev.id] = s
+
+        chargers = []
+        for c in range(len(self.charger_ids)):
+            chargers.append(Charger(int(self.charger_ids[c]), float(self.max_power[c]),
+                                    int(self.num_connectors[c]),
+                                    bool(self.is_level_3[c])))
+        return evs, chargers, slots
+
+
+def _heuristic_decisions(state, rule):
+    """
+    Regras FCLD/EDLD aplicadas a todos os episódios de uma vez.
+    Retorna arrays (episódio, slot, carregador, potência) das decisões e a
+    nova contagem de conectores ocupados por carregador.
+    """
+    active = state.present & (state.needed > 0.001)
+
+    if rule == 'FCLD':
+        primary = state.arrival
+    elif rule == 'EDLD':
+        primary = state.departure
+    else:
+        raise ValueError(f"Regra heurística desconhecida: {rule}")
+
+    # Inativos vão para o fim da fila; o slot desempata como a ordem da lista.
+    slot_idx = np.broadcast_to(np.arange(active.shape[1]), active.shape)
+    primary = np.where(active, primary, np.iinfo(np.int64).max)
+    order = np.lexsort((slot_idx, -state.required, primary), axis=-1)
+    n_active = active.sum(axis=1)
+
+    available = state.num_connectors - state.connected
+    start = np.cumsum(available, axis=1) - available
+
+    episodes = np.arange(state.n_episodes)
+    dec_ep, dec_slot, dec_ch, dec_rate = [], [], [], []
+    new_connected = np.zeros_like(state.connected)
+
+    for c in range(len(state.charger_ids)):
+        for k in range(int(state.num_connectors[c])):
+            rank = start[:, c] + k
+            valid = (k < available[:, c]) & (rank < n_active)
+            if not valid.any():
+                continue
+            ep = episodes[valid]
+            slot = order[ep, rank[valid]]
+            needed = state.needed[ep, slot]
+
+            dec_ep.append(ep)
+            dec_slot.append(slot)
+            dec_ch.append(np.full(len(ep), c))
+            dec_rate.append(np.minimum(state.max_power[c], needed / (TAU / 60.0)))
+            new_connected[valid, c] += 1
+
+    if not dec_ep:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, np.zeros(0), new_connected
+
+    return (np.concatenate(dec_ep), np.concatenate(dec_slot),
+            np.concatenate(dec_ch), np.concatenate(dec_rate), new_connected)
+
+
+def _adp_decisions(state, t, zetas):
+    """Resolve o MILP episódio a episódio sobre o estado materializado."""
+    charger_pos = {int(cid): c for c, cid in enumerate(state.charger_ids)}
+    dec_ep, dec_slot, dec_ch, dec_rate = [], [], [], []
+    new_connected = np.zeros_like(state.connected)
+
+    for e in range(state.n_episodes):
+        evs, chargers, slots = state.materialize(e)
+        decs, _ = solve_decision_model(evs, chargers, t, PRICES[t], zetas, TAU,
+                                       method=main.DECISION_METHOD, backend=main.SOLVER_BACKEND)
+        for d in decs:
+            c = charger_pos[d['charger_id']]
+            dec_ep.append(e)
+            dec_slot.append(slots[d['ev_id']])
+            dec_ch.append(c)
+            dec_rate.append(d['charge_rate'])
+            new_connected[e, c] += 1
+
+    return (np.array(dec_ep, dtype=np.int64), np.array(dec_slot, dtype=np.int64),
+            np.array(dec_ch, dtype=np.int64), np.array(dec_rate, dtype=float),
+            new_connected)
+
+
+def run_days_batch(strategy, n_episodes, zetas=None, training=False,
+                   seed=None, arrivals=None):
+    """
+    Simula `n_episodes` dias em paralelo e retorna uma lista de dicionários
+    no mesmo formato de run_day (um por episódio).
+
+    `arrivals` (bool, N x HORIZON) permite injetar o fluxo de chegadas do
+    modo treino; se omitido, ele é sorteado com p=0.15 a partir de `seed`.
+    Estratégias heurísticas (FCLD/EDLD) são totalmente vetorizadas; o ADP
+    reaproveita o estado em arrays mas resolve um MILP por episódio.
+    """
+    base_evs, chargers = get_base_scenario()
+    state = FleetState(n_episodes, base_evs, chargers)
+
+    if training and arrivals is None:
+        rng = np.random.default_rng(seed)
+        arrivals = rng.random((n_episodes, HORIZON)) < 0.15
+
+    total_req = np.full(n_episodes, sum(e.required_energy for e in base_evs))
+    total_cost = np.zeros(n_episodes)
+    total_energy = np.zeros(n_episodes)
+    load = np.zeros((n_episodes, HORIZON))
+    step_costs = np.zeros((n_episodes, HORIZON))
+    cpu_times = np.zeros(HORIZON)
+
+    record_feats = strategy == 'ADP' or training
+    feats = np.zeros((n_episodes, HORIZON, 6)) if record_feats else None
+
+    for t in range(HORIZON):
+        # Chegadas
+        if training:
+            # Mesmos IDs de run_day: um por época.
+            state.add_arrivals(t, arrivals[:, t], 100 + t,
+                               min(96, t + 35), 30.0)
+        elif t == TEST_ARRIVAL_EPOCH:
+            mask = np.ones(n_episodes, dtype=bool)
+            state.add_arrivals(t, mask, 200, 92, 45.0)
+            total_req += 45.0
+
+        # Features
+        if record_feats:
+            feats[:, t] = state.features(t)
+
+        # Decisão
+        start = time.time()
+        if strategy == 'ADP':
+            ep, slot, ch, rate, connected = _adp_decisions(state, t, zetas)
+        else:
+            ep, slot, ch, rate, connected = _heuristic_decisions(state, strategy)
+        cpu_times[t] = (time.time() - start) / n_episodes
+
+        # Física
+        state.connected = connected
+        energy = np.minimum(rate * (TAU / 60.0), state.needed[ep, slot])
+        state.needed[ep, slot] -= energy
+        state.assigned[ep, slot] = True
+        step_c = np.zeros(n_episodes)
+        step_e = np.zeros(n_episodes)
+        np.add.at(step_c, ep, energy * PRICES[t])
+        np.add.at(step_e, ep, energy)
+
+        # Penalidade
+        late = state.present & (state.departure == t) & (state.needed > 0.1)
+        step_c += np.where(late, state.needed * PENALTY, 0.0).sum(axis=1)
+
+        total_cost += step_c
+        total_energy += step_e
+        load[:, t] = step_e
+        step_costs[:, t] = step_c
+        state.present &= state.departure > t
+
+    avg_cpu = float(cpu_times.mean())
+    results = []
+    for e in range(n_episodes):
+        sl = (total_energy[e] / total_req[e] * 100) if total_req[e] > 0 else 100
+        results.append({
+            'cost': float(total_cost[e]),
+            'sl': float(sl),
+            'load': load[e],
+            'feats': feats[e].tolist() if record_feats else [],
+            'step_costs': step_costs[e].tolist(),
+            'cpu': avg_cpu,
+            'decision_epochs': HORIZON
+        })
+    return results
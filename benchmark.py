@@ -0,0 +1,241 @@
+import argparse
+import json
+import platform
+import time
+
+import numpy as np
+
+from classes import EV, Charger
+from features import FeatureExtractor
+from heuristics import solve_heuristic
+from solver import solve_decision_model
+import main
+from main import HORIZON, TAU, PRICES, run_day
+
+# ==========================================
+# BENCHMARK DE ESCALABILIDADE
+# ==========================================
+# Gera pátios sintéticos de tamanho crescente e mede a latência de cada peça
+# do caminho quente: solve_decision_model (por método), solve_heuristic,
+# FeatureExtractor.get_basis_functions e um run_day completo. O resultado é
+# um JSON com percentis por (alvo, tamanho), que pode ser comparado com um
+# baseline salvo para acusar regressões.
+
+EPOCH_BUDGET_S = TAU * 60   # Uma decisão por época de 15 minutos
+
+# Zetas de referência (checkpoint de 50k iterações)
+BENCH_ZETAS = np.array([136.57, 65.93, 58.41, 2.12, 55.86, -346.50])
+
+# Tamanhos padrão: (carregadores, conectores/carregador, fração nível 3, VEs/dia)
+DEFAULT_SIZES = [
+    (2, 2, 0.5, 50),
+    (8, 2, 0.25, 200),
+    (32, 2, 0.25, 800),
+    (64, 4, 0.25, 2000),
+    (128, 4, 0.25, 4000),
+]
+
+# Limite de pares (conector x VE) por método; acima disso a medição é pulada.
+# "método/highs" mede o mesmo método no backend em processo (ver solver.BACKENDS).
+METHOD_MAX_PAIRS = {'milp': 5_000, 'reduced': 50_000, 'fast': 2_000_000,
+                    'milp/highs': 20_000, 'reduced/highs': 200_000}
+
+
+class SyntheticSite:
+    """Pátio sintético com chegadas de Poisson (interface de `scenario` do run_day)."""
+
+    def __init__(self, n_chargers, connectors_per_charger=2, level3_fraction=0.25,
+                 evs_per_day=100, seed=0):
+        self.n_chargers = n_chargers
+        self.connectors_per_charger = connectors_per_charger
+        self.level3_fraction = level3_fraction
+        self.evs_per_day = evs_per_day
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.next_id = 1
+
+    def make_chargers(self):
+        n_l3 = int(round(self.n_chargers * self.level3_fraction))
+        return [Charger(i + 1, 50.0 if i < n_l3 else 22.0, self.connectors_per_charger, i < n_l3)
+                for i in range(self.n_chargers)]
+
+    def _new_ev(self, t):
+        dwell = int(self.rng.integers(8, 41))
+        energy = float(self.rng.uniform(10.0, 60.0))
+        ev = EV(self.next_id, t, min(HORIZON, t + dwell), energy, energy)
+        self.next_id += 1
+        return ev
+
+    def initial(self):
+        self.rng = np.random.default_rng(self.seed)
+        self.next_id = 1
+        return [], self.make_chargers()
+
+    def arrivals(self, t):
+        n = self.rng.poisson(self.evs_per_day / HORIZON)
+        return [self._new_ev(t) for _ in range(n)]
+
+    def snapshot(self, t):
+        """Estado típico na época t: VEs presentes com demanda parcial."""
+        mean_dwell = 24.0
+        n_evs = max(1, int(round(self.evs_per_day * mean_dwell / HORIZON)))
+        evs = []
+        for _ in range(n_evs):
+            arrival = int(self.rng.integers(max(0, t - 40), t + 1))
+            ev = self._new_ev(arrival)
+            ev.departure_time = max(ev.departure_time, t + 1)
+            ev.current_energy_needed *= float(self.rng.uniform(0.2, 1.0))
+            evs.append(ev)
+        return evs, self.make_chargers()
+
+
+def _summary(samples):
+    arr = np.array(samples)
+    return {
+        'samples': len(arr),
+        'mean': float(arr.mean()),
+        'p50': float(np.percentile(arr, 50)),
+        'p90': float(np.percentile(arr, 90)),
+        'p99': float(np.percentile(arr, 99)),
+        'max': float(arr.max()),
+    }
+
+
+def _time_calls(fn, inputs):
+    samples = []
+    for args in inputs:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_size(size, methods, repeats, day_repeats, seed=0):
+    """Mede todos os alvos para um tamanho de pátio. Retorna lista de resultados."""
+    n_chargers, conn, l3, evs_per_day = size
+    site = SyntheticSite(n_chargers, conn, l3, evs_per_day, seed)
+    label = f"{n_chargers}x{conn}_l3={l3}_evs={evs_per_day}"
+    base = {'size': label, 'chargers': n_chargers, 'connectors': n_chargers * conn,
+            'level3_fraction': l3, 'evs_per_day': evs_per_day}
+
+    epochs = [int(t) for t in site.rng.integers(0, HORIZON - 1, repeats)]
+    states = [(t,) + site.snapshot(t) for t in epochs]
+    n_active = int(np.mean([len(evs) for _, evs, _ in states]))
+    base['active_evs'] = n_active
+
+    results = []
+
+    def add(target, samples=None, error=None):
+        row = dict(base, target=target)
+        if error is not None:
+            row['error'] = error
+        else:
+            row.update(_summary(samples))
+            row['fits_epoch'] = row['p99'] < EPOCH_BUDGET_S
+        results.append(row)
+
+    for method in methods:
+        target = f"solve_decision_model[{method}]"
+        pairs = n_chargers * conn * n_active
+        if pairs > METHOD_MAX_PAIRS.get(method, float('inf')):
+            add(target, error=f"pulado: {pairs} pares")
+            continue
+        name, _, backend = method.partition('/')
+        try:
+            add(target, _time_calls(
+                lambda t, evs, ch: solve_decision_model(evs, ch, t, PRICES[t], BENCH_ZETAS, TAU,
+                                                        method=name, backend=backend or 'pyomo'),
+                states))
+        except Exception as exc:   # Solver ausente, etc.
+            add(target, error=f"{type(exc).__name__}: {exc}")
+
+    add("solve_heuristic[EDLD]", _time_calls(
+        lambda t, evs, ch: solve_heuristic(evs, ch, 'EDLD', TAU), states))
+
+    extractor = FeatureExtractor(TAU)
+    add("get_basis_functions", _time_calls(
+        lambda t, evs, ch: extractor.get_basis_functions(evs, ch, t), states))
+
+    for strategy, method in [('EDLD', None), ('ADP', 'fast')]:
+        target = f"run_day[{strategy}]" if method is None else f"run_day[{strategy}/{method}]"
+        previous = main.DECISION_METHOD
+        if method:
+            main.DECISION_METHOD = method
+        try:
+            add(target, _time_calls(
+                lambda: run_day(strategy, BENCH_ZETAS, scenario=site), [()] * day_repeats))
+        finally:
+            main.DECISION_METHOD = previous
+
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """Lista as regressões de p50 acima de `threshold` em relação ao baseline."""
+    ref = {(r['target'], r['size']): r for r in baseline['results'] if 'p50' in r}
+    regressions = []
+    for r in results:
+        old = ref.get((r['target'], r['size']))
+        if old is None or 'p50' not in r:
+            continue
+        ratio = r['p50'] / old['p50'] if old['p50'] > 0 else float('inf')
+        if ratio > 1 + threshold:
+            regressions.append({'target': r['target'], 'size': r['size'],
+                                'baseline_p50': old['p50'], 'p50': r['p50'], 'ratio': ratio})
+    return regressions
+
+
+def run_benchmark(sizes=None, methods=('fast', 'reduced', 'milp', 'reduced/highs', 'milp/highs'), repeats=20,
+                  day_repeats=2, seed=0, output=None, baseline=None, threshold=0.2):
+    sizes = sizes or DEFAULT_SIZES
+    results = []
+    for size in sizes:
+        for row in bench_size(size, methods, repeats, day_repeats, seed):
+            results.append(row)
+            if 'error' in row:
+                print(f"{row['size']:>32} | {row['target']:<32} | {row['error']}")
+            else:
+                flag = "" if row['fits_epoch'] else "  <-- excede a época"
+                print(f"{row['size']:>32} | {row['target']:<32} | "
+                      f"p50={row['p50']*1e3:9.3f} ms | p99={row['p99']*1e3:9.3f} ms{flag}")
+
+    report = {
+        'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                 'epoch_budget_s': EPOCH_BUDGET_S, 'repeats': repeats, 'seed': seed},
+        'results': results,
+    }
+
+    if baseline:
+        with open(baseline, 'r') as f:
+            report['regressions'] = compare(results, json.load(f), threshold)
+        for r in report['regressions']:
+            print(f"REGRESSÃO: {r['target']} @ {r['size']}: "
+                  f"{r['baseline_p50']*1e3:.3f} -> {r['p50']*1e3:.3f} ms ({r['ratio']:.2f}x)")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def _parse_size(text):
+    chargers, conn, l3, evs = text.split(',')
+    return int(chargers), int(conn), float(l3), int(evs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de escalabilidade do ADP")
+    parser.add_argument("--size", action="append", type=_parse_size,
+                        help="carregadores,conectores,fração_l3,VEs_por_dia (repetível)")
+    parser.add_argument("--methods", default="fast,reduced,milp,reduced/highs,milp/highs")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--day-repeats", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = run_benchmark(args.size, args.methods.split(','), args.repeats, args.day_repeats,
+                           args.seed, args.output, args.baseline, args.threshold)
+    raise SystemExit(1 if report.get('regressions') else 0)
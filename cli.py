@@ -0,0 +1,203 @@
+import argparse
+import os
+import signal
+
+# ==========================================
+# LINHA DE COMANDO (SEM INTERAÇÃO)
+# ==========================================
+# Ponto de entrada para jobs em lote: nada lê do stdin e o código de saída
+# diz se o job deu certo. Cada subcomando importa só o que usa (o treino não
+# carrega matplotlib; avaliar heurísticas não carrega Pyomo), o que encurta a
+# partida de jobs curtos e de processos trabalhadores.
+#
+#   python cli.py train    --iterations 5000 --workers 8
+#   python cli.py resume   --time-budget 3600
+#   python cli.py evaluate --policies ADP,EDLD,FCLD --days 2000
+#   python cli.py report   --output-dir figs
+#   python cli.py benchmark --size 8,2,0.25,200
+
+
+def _configure(args):
+    """Aplica as opções comuns às constantes do main.py (antes de criar pools)."""
+    import main
+
+    if args.checkpoint_dir:
+        main.CHECKPOINT_DIR = args.checkpoint_dir
+        main.STATE_FILE = os.path.join(args.checkpoint_dir, "training_state.npz")
+    if args.method:
+        main.DECISION_METHOD = args.method
+    if args.backend:
+        main.SOLVER_BACKEND = args.backend
+    if args.metrics_file:
+        main.METRICS_FILE = args.metrics_file
+    return main
+
+
+def _terminate(signum, frame):
+    # SIGTERM do escalonador do cluster: sai como no Ctrl+C, salvando o estado.
+    raise KeyboardInterrupt
+
+
+def _train(args, resume):
+    import numpy as np
+
+    main = _configure(args)
+    checkpoint = main.load_checkpoint()
+    if resume and not checkpoint:
+        print(f"Erro: nenhum checkpoint em {main.CHECKPOINT_DIR} para retomar.")
+        return 1
+    if not resume and checkpoint and not args.force:
+        print(f"Erro: já existe checkpoint (iteração {checkpoint['iteration']}) em "
+              f"{main.CHECKPOINT_DIR}; use 'resume' ou --force para recomeçar.")
+        return 1
+
+    start = checkpoint['iteration'] if resume else 0
+    max_iterations = None if args.iterations is None else start + args.iterations
+    signal.signal(signal.SIGTERM, _terminate)
+
+    if args.workers > 1:
+        from parallel_training import train_parallel
+
+        train_parallel(args.workers, args.batch_size, args.async_updates, args.seed,
+                       max_iterations, resume=resume, time_budget=args.time_budget)
+        return 0
+
+    if resume:
+        zetas, history = checkpoint['zetas'], checkpoint['history']
+        print(f">>> Retomando da iteração {start}...")
+    else:
+        zetas = np.zeros(6)
+        zetas[3] = 10.0 # Inicialização padrão
+        history = main.open_history()
+        history.clear()
+    step_k = checkpoint.get('step_k', 1) if resume else 1
+    accumulators = checkpoint.get('accumulators') if resume else None
+    seed_index = checkpoint.get('seed_index') if resume else None
+    zetas, iteration, reason = main.train(zetas, start, history, max_iterations,
+                                          args.time_budget, step_k, accumulators, seed_index)
+    label = {'converged': "convergido", 'limit': "concluído", 'interrupted': "interrompido"}[reason]
+    print(f">>> Treino {label}; estado salvo na iteração {iteration}.")
+    return 0
+
+
+def _evaluate(args):
+    main = _configure(args)
+    from evaluation import _load_zetas, evaluate_policies, print_report
+
+    names = [p for p in args.policies.split(',') if p]
+    rules = [p for p in names if p != 'ADP']
+    policies = {}
+    if 'ADP' in names:
+        if args.checkpoint:
+            for path in args.checkpoint:
+                policies[f"ADP:{os.path.basename(path)}"] = ('ADP', _load_zetas(path))
+        else:
+            checkpoint = main.load_checkpoint()
+            if not checkpoint:
+                print(f"Erro: nenhum checkpoint em {main.CHECKPOINT_DIR} para avaliar o ADP.")
+                return 1
+            policies['ADP'] = ('ADP', checkpoint['zetas'])
+    for rule in rules:
+        policies[rule] = (rule, None)
+
+    baseline = args.baseline or (rules[0] if rules else next(iter(policies)))
+    report = evaluate_policies(policies, args.days, args.min_days, args.batch_days, args.workers,
+                               args.seed, args.confidence, args.rel_tol, args.abs_tol, baseline)
+    print_report(report)
+    if args.output:
+        import json
+
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def _report(args):
+    import matplotlib
+    matplotlib.use('Agg')   # Sem janela: as figuras só vão para arquivo
+
+    main = _configure(args)
+    checkpoint = main.load_checkpoint()
+    if not checkpoint:
+        print(f"Erro: nenhum checkpoint em {main.CHECKPOINT_DIR}.")
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+    main.generate_final_report(checkpoint['zetas'], checkpoint['history'], args.output_dir)
+    return 0
+
+
+def _benchmark(args):
+    _configure(args)
+    from benchmark import _parse_size, run_benchmark
+
+    sizes = [_parse_size(text) for text in args.size] if args.size else None
+    report = run_benchmark(sizes, args.methods.split(','), args.repeats, args.day_repeats,
+                           args.seed, args.output, args.baseline, args.threshold)
+    return 1 if report.get('regressions') else 0
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--checkpoint-dir", default=None, help="Pasta dos checkpoints e do histórico")
+    common.add_argument("--method", default=None, help="'milp', 'reduced', 'fast' ou 'check'")
+    common.add_argument("--backend", default=None, help="'pyomo' ou 'highs'")
+    common.add_argument("--metrics-file", default=None, help="JSONL de telemetria por iteração")
+
+    parser = argparse.ArgumentParser(description="ADP de recarga de VEs (linha de comando)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("train", "Treino do zero"), ("resume", "Continua do último checkpoint")):
+        p = sub.add_parser(name, parents=[common], help=help_text)
+        p.add_argument("--iterations", type=int, default=None, help="Iterações a rodar neste job")
+        p.add_argument("--time-budget", type=float, default=None, help="Segundos de treino")
+        p.add_argument("--workers", type=int, default=1, help="> 1 usa o treino paralelo")
+        p.add_argument("--batch-size", type=int, default=None)
+        p.add_argument("--async-updates", action="store_true")
+        p.add_argument("--seed", type=int, default=0)
+        if name == "train":
+            p.add_argument("--force", action="store_true", help="Recomeça mesmo com checkpoint")
+
+    p = sub.add_parser("evaluate", parents=[common], help="Avaliação Monte Carlo das políticas")
+    p.add_argument("--policies", default="ADP,EDLD,FCLD")
+    p.add_argument("--checkpoint", action="append", default=[],
+                   help="JSON de checkpoint com zetas para o ADP (repetível)")
+    p.add_argument("--baseline", default=None)
+    p.add_argument("--days", type=int, default=5000, help="Máximo de dias simulados")
+    p.add_argument("--min-days", type=int, default=100)
+    p.add_argument("--batch-days", type=int, default=None)
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--confidence", type=float, default=0.95)
+    p.add_argument("--rel-tol", type=float, default=0.01)
+    p.add_argument("--abs-tol", type=float, default=None)
+    p.add_argument("--output", default=None)
+
+    p = sub.add_parser("report", parents=[common], help="Gráficos do último checkpoint")
+    p.add_argument("--output-dir", default=".")
+
+    p = sub.add_parser("benchmark", parents=[common], help="Benchmark de escalabilidade")
+    p.add_argument("--size", action="append",
+                   help="carregadores,conectores,fração_l3,VEs_por_dia (repetível)")
+    p.add_argument("--methods", default="fast,reduced,milp,reduced/highs,milp/highs")
+    p.add_argument("--repeats", type=int, default=20)
+    p.add_argument("--day-repeats", type=int, default=2)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--output", default="benchmark_results.json")
+    p.add_argument("--baseline", default=None)
+    p.add_argument("--threshold", type=float, default=0.2)
+    return parser
+
+
+def run(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command in ("train", "resume"):
+        return _train(args, resume=args.command == "resume")
+    if args.command == "evaluate":
+        return _evaluate(args)
+    if args.command == "report":
+        return _report(args)
+    return _benchmark(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from assignment import ev_terms
+
+# ==========================================
+# CACHE DE DECISÕES (ESTADO QUANTIZADO + LRU)
+# ==========================================
+# Muitas épocas de treino chegam ao mesmo estado do ponto de vista do solver
+# (os dois VEs fixos com a mesma carga, a mesma faixa de preço).
+# A chave canônica descreve o estado sem IDs nem época absoluta:
+#   - por VE candidato: (demanda restante quantizada, urgência), ordenado;
+#   - ocupação de cada carregador (opcional: o MILP a ignora);
+#   - preço quantizado.
+# A parte do objetivo que não depende da decisão (bias, conectores, demanda
+# total, urgência total e tempo) é descontada ao guardar e recalculada para o
+# estado atual na consulta. Os zetas não fazem parte da chave: o cache é
+# esvaziado quando eles mudam mais que `zeta_tol`.
+
+
+def _quantize(value, step):
+    return round(value / step) if step > 0 else value
+
+
+class DecisionCache:
+    def __init__(self, max_entries=100_000, energy_step=0.0, price_step=0.0,
+                 zeta_tol=0.0, tau=15, include_occupancy=True):
+        self.max_entries = max_entries
+        self.include_occupancy = include_occupancy
+        self.energy_step = energy_step
+        self.price_step = price_step
+        self.zeta_tol = zeta_tol
+        self.tau = tau
+
+        self.entries = OrderedDict()
+        self.ref_zetas = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # --- Chave canônica ---
+
+    def key(self, evs, chargers, current_epoch, energy_price):
+        """Retorna (chave, IDs dos candidatos na ordem canônica)."""
+        return self._key(ev_terms(evs, current_epoch), chargers, energy_price)
+
+    def _key(self, terms, chargers, energy_price):
+        need, urg, cands = terms
+        rows = sorted(
+            (_quantize(need[j], self.energy_step), urg[j], pos)
+            for pos, j in enumerate(cands)
+        )
+        ids = [cands[pos] for _, _, pos in rows]
+        occupancy = tuple(len(c.connected_evs) for c in chargers) if self.include_occupancy else ()
+        key = (
+            tuple((q, u) for q, u, _ in rows),
+            occupancy,
+            _quantize(energy_price, self.price_step),
+        )
+        return key, ids
+
+    def _constant_term(self, evs, urg, chargers, current_epoch, zetas):
+        """Parte do objetivo que independe da decisão."""
+        return (zetas[0] +
+                zetas[2]*sum(c.num_connectors for c in chargers) +
+                zetas[3]*sum(ev.current_energy_needed for ev in evs) +
+                zetas[4]*sum(urg.values()) +
+                zetas[5]*(current_epoch * self.tau) / (96 * self.tau))
+
+    # --- Zetas ---
+
+    def sync_zetas(self, zetas):
+        """Esvazia o cache se os zetas se afastaram da referência."""
+        zetas = np.asarray(zetas, dtype=float)
+        if self.ref_zetas is not None and np.max(np.abs(zetas - self.ref_zetas)) <= self.zeta_tol:
+            return
+        if self.entries:
+            self.invalidations += 1
+        self.entries.clear()
+        self.ref_zetas = zetas.copy()
+
+    # --- Consulta ---
+
+    def lookup_or_solve(self, solve, evs, chargers, current_epoch, energy_price, zetas,
+                        constant=None):
+        """
+        Retorna (decisões, objetivo) do cache ou de `solve()` (sem argumentos),
+        no mesmo formato de solve_decision_model. `constant` (opcional) é o
+        termo constante já calculado (FeatureState.constant_term).
+        """
+        self.sync_zetas(zetas)
+
+        terms = ev_terms(evs, current_epoch)
+        key, ids = self._key(terms, chargers, energy_price)
+        if not ids:
+            # Sem candidatos o solver já retorna ([], 0.0) imediatamente.
+            return solve()
+        if constant is None:
+            constant = self._constant_term(evs, terms[1], chargers, current_epoch, zetas)
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            templates, obj = entry
+            return self._expand(templates, ids, evs), obj + constant
+
+        self.misses += 1
+        decisions, obj = solve()
+
+        pos = {ev_id: p for p, ev_id in enumerate(ids)}
+        templates = [(d['charger_id'], d['connector_id'], pos[d['ev_id']], d['charge_rate'])
+                     for d in decisions]
+        self.entries[key] = (templates, obj - constant)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+        return decisions, obj
+
+    def forget(self, evs, chargers, current_epoch, energy_price):
+        """Remove a entrada do estado atual (ex.: decisão de fallback)."""
+        key, _ = self.key(evs, chargers, current_epoch, energy_price)
+        self.entries.pop(key, None)
+
+    def _expand(self, templates, ids, evs):
+        h = self.tau / 60.0
+        need = {}
+        for ev in evs:
+            need.setdefault(ev.id, ev.current_energy_needed)
+        decisions = []
+        for charger_id, connector_id, p, rate in templates:
+            ev_id = ids[p]
+            if self.energy_step > 0:
+                # Com quantização, a taxa guardada pode exceder a demanda real.
+                rate = min(rate, need[ev_id] / h)
+            decisions.append({
+                'charger_id': charger_id, 'connector_id': connector_id,
+                'ev_id': ev_id, 'charge_rate': rate
+            })
+        return decisions
+
+    # --- Estatísticas ---
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'entries': len(self.entries),
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from classes import EV, Charger
+from solver import solve_decision_model
+import main
+from main import CHECKPOINT_DIR, CHECKPOINT_FILE, PRICES, TAU, read_latest_zetas
+
+# ==========================================
+# SERVIÇO DE DECISÃO (ASYNCIO)
+# ==========================================
+# Processo de longa duração que serve a política ADP a vários pátios.
+# Protocolo: uma linha JSON por pedido, numa conexão TCP local:
+#   {"id": ..., "site": ..., "epoch": t, "price": opcional,
+#    "evs": [{campos de EV}], "chargers": [{campos de Charger}]}
+# e uma linha JSON por resposta:
+#   {"id": ..., "decisions": [...], "objective": ..., "iteration": ...}
+# Pedidos concorrentes são agrupados em lotes (até `max_batch` ou
+# `max_wait_ms`) e cada lote vai para um pool de processos: o laço de
+# eventos nunca espera um solve_decision_model. Os zetas vêm do
+# read_latest_zetas() (só leitura: o treino pode estar gravando os mesmos
+# arquivos) e são recarregados quando os checkpoints mudam.
+
+DEFAULT_PORT = 8765
+RELOAD_INTERVAL = 5.0   # Segundos entre verificações de checkpoint novo
+
+
+def ev_from_dict(d):
+    ev = EV(d['id'], d['arrival_time'], d['departure_time'], d['required_energy'],
+            d.get('current_energy_needed', d['required_energy']))
+    ev.assigned_charger_id = d.get('assigned_charger_id')
+    return ev
+
+
+def charger_from_dict(d):
+    charger = Charger(d['id'], d['max_power'], d['num_connectors'], d.get('is_level_3', False))
+    charger.connected_evs = {int(k): v for k, v in d.get('connected_evs', {}).items()}
+    return charger
+
+
+def state_to_dict(evs, chargers, current_epoch, **extra):
+    """Pedido no formato do serviço a partir de objetos EV/Charger."""
+    request = {
+        'epoch': current_epoch,
+        'evs': [{'id': e.id, 'arrival_time': e.arrival_time, 'departure_time': e.departure_time,
+                 'required_energy': e.required_energy,
+                 'current_energy_needed': e.current_energy_needed,
+                 'assigned_charger_id': e.assigned_charger_id} for e in evs],
+        'chargers': [{'id': c.id, 'max_power': c.max_power, 'num_connectors': c.num_connectors,
+                      'is_level_3': c.is_level_3, 'connected_evs': c.connected_evs}
+                     for c in chargers],
+    }
+    request.update(extra)
+    return request
+
+
+def _solve_batch(requests, zetas, method):
+    """Roda num processo do pool: resolve um lote de pedidos já decodificados."""
+    out = []
+    for req in requests:
+        try:
+            t = req['epoch']
+            price = req.get('price', PRICES[t % len(PRICES)])
+            evs = [ev_from_dict(e) for e in req['evs']]
+            chargers = [charger_from_dict(c) for c in req['chargers']]
+            solve = lambda: solve_decision_model(evs, chargers, t, price, zetas, TAU, method=method,
+                                                 backend=main.SOLVER_BACKEND)
+            if main.DECISION_TABLE:
+                # Estado fora da tabela (ou zetas recarregados) vai ao solver.
+                decisions, obj = main.load_decision_table().lookup_or_solve(
+                    solve, evs, chargers, t, price, zetas)
+            else:
+                decisions, obj = solve()
+            out.append({'decisions': decisions, 'objective': obj})
+        except Exception as exc:
+            out.append({'error': f"{type(exc).__name__}: {exc}"})
+    return out
+
+
+def _checkpoint_fingerprint():
+    """Maior mtime entre os arquivos de checkpoint (0 se não houver)."""
+    latest = 0
+    paths = [CHECKPOINT_FILE]
+    if os.path.isdir(CHECKPOINT_DIR):
+        paths += [os.path.join(CHECKPOINT_DIR, name) for name in os.listdir(CHECKPOINT_DIR)]
+    for path in paths:
+        try:
+            latest = max(latest, os.stat(path).st_mtime_ns)
+        except OSError:
+            continue
+    return latest
+
+
+class DecisionService:
+    def __init__(self, workers=None, method=None, max_batch=16, max_wait_ms=2.0,
+                 reload_interval=RELOAD_INTERVAL):
+        self.workers = workers or os.cpu_count()
+        self.method = method or main.DECISION_METHOD
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.reload_interval = reload_interval
+
+        self.zetas = None
+        self.iteration = None
+        self._fingerprint = None
+        self._queue = None
+        self._slots = None
+        self._pool = None
+        self.served = 0
+        self.batches = 0
+
+    # --- Zetas ---
+
+    def reload(self):
+        """Recarrega os zetas do último checkpoint. Retorna True se mudaram."""
+        fingerprint = _checkpoint_fingerprint()
+        if fingerprint == self._fingerprint:
+            return False
+        checkpoint = read_latest_zetas()
+        self._fingerprint = fingerprint
+        if not checkpoint:
+            if self.zetas is None:
+                raise RuntimeError("Nenhum checkpoint encontrado para servir a política")
+            return False
+        changed = self.iteration != checkpoint['iteration']
+        self.zetas = np.array(checkpoint['zetas'])
+        self.iteration = checkpoint['iteration']
+        if changed:
+            print(f">>> Zetas carregados (iteração {self.iteration}): {np.round(self.zetas, 2)}")
+        return changed
+
+    async def _watch_checkpoints(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as exc:
+                print(f"Aviso: falha ao recarregar checkpoint ({exc}); mantendo zetas atuais")
+
+    # --- Lotes ---
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            asyncio.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        zetas, iteration = self.zetas, self.iteration
+        try:
+            results = await loop.run_in_executor(self._pool, _solve_batch,
+                                                 [req for req, _ in batch], zetas, self.method)
+        except Exception as exc:
+            results = [{'error': f"{type(exc).__name__}: {exc}"} for _ in batch]
+        finally:
+            self._slots.release()
+        self.batches += 1
+        # Toda future recebe resultado ou exceção: um pedido malformado não
+        # pode deixar os demais clientes do lote esperando para sempre.
+        for (req, future), result in zip(batch, results):
+            if future.done():
+                continue
+            try:
+                result['id'] = req.get('id')
+                result['iteration'] = iteration
+                future.set_result(result)
+            except Exception as exc:
+                future.set_exception(exc)
+
+    async def decide(self, request):
+        """Enfileira um pedido e espera a resposta (uso dentro do processo)."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future))
+        return await future
+
+    # --- Rede ---
+
+    async def _handle(self, reader, writer):
+        pending = set()
+        lock = asyncio.Lock()
+
+        async def answer(line):
+            try:
+                request = json.loads(line)
+                if isinstance(request, dict):
+                    response = await self.decide(request)
+                else:
+                    response = {'error': f"Pedido deve ser um objeto JSON, não {type(request).__name__}"}
+            except json.JSONDecodeError as exc:
+                response = {'error': f"JSON inválido: {exc}"}
+            except Exception as exc:
+                response = {'error': f"{type(exc).__name__}: {exc}"}
+            self.served += 1
+            async with lock:
+                writer.write((json.dumps(response) + '\n').encode())
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                # Pedidos da mesma conexão podem estar em lotes diferentes.
+                task = asyncio.create_task(answer(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.reload()
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        server = await asyncio.start_server(self._handle, host, port)
+        print(f">>> Serviço de decisão em {host}:{port} | {self.workers} processos | "
+              f"método {self.method}")
+        tasks = [asyncio.create_task(self._batcher()),
+                 asyncio.create_task(self._watch_checkpoints())]
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._pool.shutdown(cancel_futures=True)
+
+
+# ==========================================
+# GERADOR DE CARGA
+# ==========================================
+
+async def _client(host, port, states, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for request in states:
+            start = time.perf_counter()
+            writer.write((json.dumps(request) + '\n').encode())
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            if 'error' in response:
+                print(f"Aviso: erro do serviço: {response['error']}")
+    finally:
+        writer.close()
+
+
+async def run_load(host='127.0.0.1', port=DEFAULT_PORT, clients=16, requests=50,
+                   size=(8, 2, 0.25, 200), seed=0):
+    """Cada cliente simula um pátio e envia `requests` estados em sequência."""
+    from benchmark import SyntheticSite
+
+    per_client = []
+    for c in range(clients):
+        site = SyntheticSite(*size, seed=seed + c)
+        states = []
+        for k, t in enumerate(site.rng.integers(0, len(PRICES) - 1, requests)):
+            evs, chargers = site.snapshot(int(t))
+            states.append(state_to_dict(evs, chargers, int(t), id=k, site=c))
+        per_client.append(states)
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, s, latencies) for s in per_client))
+    elapsed = time.perf_counter() - start
+
+    arr = np.array(latencies)
+    report = {
+        'requests': len(arr),
+        'throughput_rps': len(arr) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': float(np.percentile(arr, 50) * 1e3),
+        'p99_ms': float(np.percentile(arr, 99) * 1e3),
+        'max_ms': float(arr.max() * 1e3),
+    }
+    print(f"Pedidos: {report['requests']} | {report['throughput_rps']:.1f} req/s | "
+          f"p50={report['p50_ms']:.2f} ms | p99={report['p99_ms']:.2f} ms")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serviço de decisão ADP")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--workers", type=int, default=None)
+    serve.add_argument("--method", default=None)
+    serve.add_argument("--max-batch", type=int, default=16)
+    serve.add_argument("--max-wait-ms", type=float, default=2.0)
+    serve.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL)
+    serve.add_argument("--table", default=None, help="Tabela compilada (decision_table.py)")
+
+    load = sub.add_parser("loadgen")
+    load.add_argument("--host", default="127.0.0.1")
+    load.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load.add_argument("--clients", type=int, default=16)
+    load.add_argument("--requests", type=int, default=50)
+    load.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    try:
+        if args.command == "serve":
+            if args.table:
+                main.DECISION_TABLE = args.table
+            service = DecisionService(args.workers, args.method, args.max_batch,
+                                      args.max_wait_ms, args.reload_interval)
+            asyncio.run(service.serve(args.host, args.port))
+        else:
+            asyncio.run(run_load(args.host, args.port, args.clients, args.requests, seed=args.seed))
+    except KeyboardInterrupt:
+        pass
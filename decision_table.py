@@ -0,0 +1,423 @@
+import argparse
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+import main
+from main import HORIZON, PRICES, TAU, get_base_scenario, load_checkpoint, run_day
+from assignment import ev_terms
+from classes import EV, Charger
+from decision_cache import DecisionCache
+from evaluation import _load_zetas, day_seeds
+from scenarios import StochasticDayScenario, load_site
+from solver import solve_decision_model
+
+# ==========================================
+# TABELA DE DECISÕES COMPILADA
+# ==========================================
+# Compilação offline de uma política treinada (zetas fixos) para um pátio.
+# A grade de estados é a chave canônica do DecisionCache, sem ocupação:
+#   - por VE candidato: demanda restante em passos de `energy_step` kWh e
+#     épocas até a partida (a urgência 1/(partida - t) já é discreta);
+#   - faixa de preço (valores distintos de PRICES).
+# A ocupação atual dos conectores não entra: o modelo de decisão reconecta
+# todos os VEs a cada época. Os pontos da grade vêm dos estados visitados
+# em dias estocásticos (e, opcionalmente, de sorteios uniformes na grade);
+# cada um é resolvido uma vez, num pool de processos. Em operação, a
+# consulta monta a chave e lê um dicionário; estado fora da tabela, outro
+# pátio ou outros zetas caem no solver.
+
+TABLE_FORMAT = 1
+DEMAND_RATE = -1.0  # Taxa "demanda restante / h" (limitada pela potência), refeita na consulta
+
+
+def layout_of(chargers):
+    """Assinatura do pátio: (id, potência, conectores) de cada carregador."""
+    return tuple((c.id, float(c.max_power), c.num_connectors) for c in chargers)
+
+
+class DecisionTable(DecisionCache):
+    """
+    Decisões pré-computadas de um pátio, com a mesma interface do
+    DecisionCache (lookup_or_solve/forget): o run_day e o serviço de decisão
+    a usam no lugar do cache. A tabela não muda em operação.
+    """
+
+    def __init__(self, chargers, zetas, energy_step=0.5, tau=15, zeta_tol=1e-9):
+        super().__init__(max_entries=None, energy_step=energy_step, zeta_tol=zeta_tol, tau=tau,
+                         include_occupancy=False)
+        self.layout = layout_of(chargers)
+        self.power = {c.id: c.max_power for c in chargers}
+        self.ref_zetas = np.array(zetas, dtype=float)
+        self.path = None
+        self.bypassed = 0   # Consultas com outro pátio ou outros zetas
+
+    # --- Consulta ---
+
+    def lookup_or_solve(self, solve, evs, chargers, current_epoch, energy_price, zetas,
+                        constant=None):
+        if (layout_of(chargers) != self.layout or
+                np.max(np.abs(np.asarray(zetas, dtype=float) - self.ref_zetas)) > self.zeta_tol):
+            self.bypassed += 1
+            return solve()
+
+        terms = ev_terms(evs, current_epoch)
+        key, ids = self._key(terms, chargers, energy_price)
+        if not ids:
+            return solve()
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return solve()
+
+        self.hits += 1
+        if constant is None:
+            constant = self._constant_term(evs, terms[1], chargers, current_epoch, zetas)
+        templates, obj = entry
+        return self._expand(templates, ids, evs), obj + constant
+
+    def forget(self, evs, chargers, current_epoch, energy_price):
+        # Decisões de fallback nunca entram na tabela.
+        pass
+
+    def _expand(self, templates, ids, evs):
+        h = self.tau / 60.0
+        need = {}
+        for ev in evs:
+            need.setdefault(ev.id, ev.current_energy_needed)
+        decisions = []
+        for charger_id, connector_id, p, rate in templates:
+            ev_id = ids[p]
+            limit = min(self.power[charger_id], need[ev_id] / h)
+            decisions.append({
+                'charger_id': charger_id, 'connector_id': connector_id,
+                'ev_id': ev_id, 'charge_rate': limit if rate == DEMAND_RATE else min(rate, limit)
+            })
+        return decisions
+
+    def stats(self):
+        stats = super().stats()
+        stats['bypassed'] = self.bypassed
+        return stats
+
+    # --- Grade ---
+
+    def grid_state(self, key, current_epoch=0):
+        """VEs do ponto da grade (IDs 1..n na ordem canônica)."""
+        evs = []
+        for p, (q, u) in enumerate(key[0]):
+            delay = int(round(1.0 / u)) if u > 0 else 0
+            need = q * self.energy_step
+            evs.append(EV(p + 1, current_epoch, current_epoch + delay, need, need))
+        return evs
+
+    # --- Arquivo ---
+
+    def save(self, path):
+        """Grava a tabela em .npz (arrays planos, sem pickle)."""
+        counts, need_q, delay, price = [], [], [], []
+        tpl_counts, tpl, tpl_rate, obj = [], [], [], []
+        for key, (templates, value) in self.entries.items():
+            counts.append(len(key[0]))
+            for q, u in key[0]:
+                need_q.append(q)
+                delay.append(int(round(1.0 / u)) if u > 0 else 0)
+            price.append(key[2])
+            tpl_counts.append(len(templates))
+            for charger_id, connector_id, p, rate in templates:
+                tpl.append((charger_id, connector_id, p))
+                tpl_rate.append(rate)
+            obj.append(value)
+
+        tmp_path = path + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            format=np.array(TABLE_FORMAT),
+            layout=np.array(self.layout, dtype=float).reshape(-1, 3),
+            zetas=self.ref_zetas,
+            energy_step=np.array(self.energy_step),
+            tau=np.array(self.tau),
+            counts=np.array(counts, dtype=np.int32),
+            need_q=np.array(need_q, dtype=np.int32),
+            delay=np.array(delay, dtype=np.int32),
+            price=np.array(price, dtype=float),
+            tpl_counts=np.array(tpl_counts, dtype=np.int32),
+            tpl=np.array(tpl, dtype=np.int32).reshape(-1, 3),
+            tpl_rate=np.array(tpl_rate, dtype=float),
+            obj=np.array(obj, dtype=float),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data['format']) != TABLE_FORMAT:
+                raise ValueError(f"Formato de tabela desconhecido em {path}")
+            chargers = [Charger(int(i), power, int(n), power >= 50.0)
+                        for i, power, n in data['layout'].tolist()]
+            table = cls(chargers, data['zetas'], float(data['energy_step']), int(data['tau']))
+            need_q, delay = data['need_q'].tolist(), data['delay'].tolist()
+            tpl, tpl_rate = data['tpl'].tolist(), data['tpl_rate'].tolist()
+            i = k = 0
+            for n, price, m, value in zip(data['counts'].tolist(), data['price'].tolist(),
+                                          data['tpl_counts'].tolist(), data['obj'].tolist()):
+                rows = tuple((need_q[r], 1.0 / delay[r] if delay[r] > 0 else 0.0)
+                             for r in range(i, i + n))
+                templates = [tuple(tpl[r]) + (tpl_rate[r],) for r in range(k, k + m)]
+                table.entries[(rows, (), price)] = (templates, value)
+                i += n
+                k += m
+        table.path = path
+        return table
+
+
+def decision_value(decisions, evs, chargers, current_epoch, energy_price, zetas, tau=15):
+    """Objetivo do modelo de decisão avaliado numa decisão qualquer (mesma constante do solver)."""
+    h = tau / 60.0
+    _, urg, _ = ev_terms(evs, current_epoch)
+    value = (zetas[0] +
+             zetas[2] * sum(c.num_connectors for c in chargers) +
+             zetas[3] * sum(ev.current_energy_needed for ev in evs) +
+             zetas[4] * sum(urg.values()) +
+             zetas[5] * ((current_epoch * tau) / (96 * tau)))
+    for d in decisions:
+        value += (zetas[1] - zetas[2] - zetas[4] * urg[d['ev_id']] +
+                  (energy_price - zetas[3]) * h * d['charge_rate'])
+    return value
+
+
+# ==========================================
+# COLETA DE ESTADOS
+# ==========================================
+
+class _StateRecorder:
+    """Ocupa o lugar do cache no run_day só para copiar cada estado de decisão."""
+
+    def __init__(self):
+        self.states = []
+
+    def lookup_or_solve(self, solve, evs, chargers, current_epoch, energy_price, zetas,
+                        constant=None):
+        if any(ev.current_energy_needed > 0.001 for ev in evs):
+            self.states.append((
+                [EV(e.id, e.arrival_time, e.departure_time, e.required_energy, e.current_energy_needed)
+                 for e in evs],
+                [Charger(c.id, c.max_power, c.num_connectors, c.is_level_3, dict(c.connected_evs))
+                 for c in chargers],
+                current_epoch, energy_price))
+        return solve()
+
+    def forget(self, evs, chargers, current_epoch, energy_price):
+        pass
+
+
+def _init_worker(method=None, backend=None):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # O run_day da coleta lê o método e o backend de main.
+    if method is not None:
+        main.DECISION_METHOD = method
+    if backend is not None:
+        main.SOLVER_BACKEND = backend
+
+
+def _collect_days(base, zetas, seeds):
+    """Estados (evs, carregadores, época, preço) visitados pela política ADP."""
+    recorder = _StateRecorder()
+    for seed in seeds:
+        run_day('ADP', zetas, cache=recorder, scenario=StochasticDayScenario(base, seed))
+    return recorder.states
+
+
+def random_states(chargers, n_states, energy_step=0.5, max_evs=None, max_energy=60.0,
+                  max_delay=HORIZON, seed=0):
+    """Pontos uniformes da grade (demanda, épocas até a partida, faixa de preço)."""
+    rng = np.random.default_rng(seed)
+    max_evs = max_evs or sum(c.num_connectors for c in chargers) + 2
+    bands = sorted(set(PRICES))
+    states = []
+    for _ in range(n_states):
+        evs = []
+        for j in range(int(rng.integers(1, max_evs + 1))):
+            need = int(rng.integers(1, int(max_energy / energy_step) + 1)) * energy_step
+            evs.append(EV(j + 1, 0, int(rng.integers(1, max_delay + 1)), need, need))
+        states.append((evs, chargers, 0, bands[int(rng.integers(len(bands)))]))
+    return states
+
+
+def _solve_keys(keys, chargers, zetas, energy_step, tau, method, backend):
+    """Roda num processo do pool: resolve pontos da grade e devolve as entradas da tabela."""
+    table = DecisionTable(chargers, zetas, energy_step, tau)
+    h = tau / 60.0
+    power = {c.id: c.max_power for c in chargers}
+    out = []
+    for key in keys:
+        evs = table.grid_state(key)
+        decisions, obj = solve_decision_model(evs, chargers, 0, key[2], zetas, tau,
+                                              method=method, backend=backend)
+        templates = []
+        for d in decisions:
+            p = d['ev_id'] - 1
+            rate = d['charge_rate']
+            demand = evs[p].current_energy_needed / h
+            if abs(rate - demand) <= 1e-9 * max(1.0, demand) and rate < power[d['charger_id']] - 1e-9:
+                rate = DEMAND_RATE
+            templates.append((d['charger_id'], d['connector_id'], p, rate))
+        _, urg, _ = ev_terms(evs, 0)
+        out.append((key, templates, obj - table._constant_term(evs, urg, chargers, 0, zetas)))
+    return out
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# ==========================================
+# COMPILAÇÃO E VALIDAÇÃO
+# ==========================================
+
+def compile_table(zetas, base=get_base_scenario, days=200, samples=0, energy_step=0.5,
+                  workers=None, seed=0, method=None, backend=None, chunk=64):
+    """
+    Compila a tabela do pátio de `base` para `zetas`: estados de `days` dias
+    estocásticos mais `samples` pontos uniformes da grade, cada ponto
+    resolvido uma vez. Retorna (tabela, resumo).
+    """
+    method = method or main.DECISION_METHOD
+    backend = backend or main.SOLVER_BACKEND
+    chargers = base()[1]
+    table = DecisionTable(chargers, zetas, energy_step, TAU)
+    start = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(method, backend)) as pool:
+        seeds = day_seeds(seed, 0, days)
+        states = []
+        for part in pool.map(partial(_collect_days, base, zetas), _chunks(seeds, 8)):
+            states.extend(part)
+        states.extend(random_states(chargers, samples, energy_step, seed=seed))
+
+        keys = list(dict.fromkeys(table._key(ev_terms(evs, t), chargers, price)[0]
+                                  for evs, _, t, price in states))
+        solve = partial(_solve_keys, chargers=chargers, zetas=zetas, energy_step=energy_step,
+                        tau=TAU, method=method, backend=backend)
+        for part in pool.map(solve, _chunks(keys, chunk)):
+            for key, templates, value in part:
+                table.entries[key] = (templates, value)
+
+    summary = {'states': len(states), 'entries': len(table.entries),
+               'seconds': time.time() - start, 'method': method, 'backend': backend}
+    return table, summary
+
+
+def _miss():
+    return None
+
+
+def validate_table(table, zetas, base=get_base_scenario, days=50, seed=1, method=None,
+                   backend=None, workers=None, tol=1e-6):
+    """
+    Compara a tabela com o solve exato em estados de dias novos (sementes
+    diferentes das da compilação): cobertura, concordância das decisões,
+    gap do objetivo nas consultas atendidas e latências.
+    """
+    method = method or main.DECISION_METHOD
+    backend = backend or main.SOLVER_BACKEND
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(method, backend)) as pool:
+        states = []
+        for part in pool.map(partial(_collect_days, base, zetas), _chunks(day_seeds(seed, 0, days), 8)):
+            states.extend(part)
+
+    lookup_us, solve_ms, gaps = [], [], []
+    agree = 0
+    for evs, chargers, t, price in states:
+        begin = time.perf_counter()
+        exact, exact_obj = solve_decision_model(evs, chargers, t, price, zetas, TAU,
+                                                method=method, backend=backend)
+        solve_ms.append((time.perf_counter() - begin) * 1e3)
+
+        begin = time.perf_counter()
+        found = table.lookup_or_solve(_miss, evs, chargers, t, price, zetas)
+        lookup_us.append((time.perf_counter() - begin) * 1e6)
+        if found is None:
+            continue
+
+        decisions = found[0]
+        value = decision_value(decisions, evs, chargers, t, price, zetas, TAU)
+        gaps.append((value - exact_obj) / max(1.0, abs(exact_obj)))
+        # Conectores de um mesmo carregador são intercambiáveis.
+        pairs = lambda ds: sorted((d['charger_id'], d['ev_id'], round(d['charge_rate'], 6)) for d in ds)
+        agree += pairs(decisions) == pairs(exact)
+
+    gaps = np.array(gaps)
+    hits = len(gaps)
+    return {
+        'states': len(states),
+        'coverage': hits / len(states) if states else 0.0,
+        'agreement': agree / hits if hits else None,
+        'worse': int(np.sum(gaps > tol)),
+        'mean_gap': float(gaps.mean()) if hits else None,
+        'max_gap': float(gaps.max()) if hits else None,
+        'lookup_us': {'p50': float(np.percentile(lookup_us, 50)), 'p99': float(np.percentile(lookup_us, 99))}
+                     if lookup_us else None,
+        'solve_ms': {'p50': float(np.percentile(solve_ms, 50)), 'p99': float(np.percentile(solve_ms, 99))}
+                    if solve_ms else None,
+    }
+
+
+def print_validation(report):
+    print(f"Estados validados: {report['states']} | cobertura {report['coverage']:.1%}")
+    if report['agreement'] is not None:
+        print(f"Decisões iguais ao solve exato: {report['agreement']:.1%} | "
+              f"piores: {report['worse']} | gap médio {report['mean_gap']:.2e} | "
+              f"gap máx {report['max_gap']:.2e}")
+    if report['lookup_us']:
+        print(f"Consulta: p50 {report['lookup_us']['p50']:.1f} us | p99 {report['lookup_us']['p99']:.1f} us")
+        print(f"Solver:   p50 {report['solve_ms']['p50']:.2f} ms | p99 {report['solve_ms']['p99']:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tabela de decisões compilada da política ADP")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("compile", "validate"):
+        p = sub.add_parser(name)
+        p.add_argument("--table", default="decision_table.npz")
+        p.add_argument("--site", default=None, help="JSON do pátio (padrão: pátio base)")
+        p.add_argument("--checkpoint", default=None, help="JSON com os zetas (padrão: último checkpoint)")
+        p.add_argument("--method", default=None)
+        p.add_argument("--backend", default=None)
+        p.add_argument("--workers", type=int, default=None)
+        p.add_argument("--days", type=int, default=200 if name == "compile" else 50)
+        p.add_argument("--seed", type=int, default=0 if name == "compile" else 1)
+        if name == "compile":
+            p.add_argument("--samples", type=int, default=0, help="Pontos uniformes extras da grade")
+            p.add_argument("--energy-step", type=float, default=0.5)
+            p.add_argument("--validate-days", type=int, default=0)
+    args = parser.parse_args()
+
+    base = partial(load_site, args.site) if args.site else get_base_scenario
+    if args.checkpoint:
+        zetas = _load_zetas(args.checkpoint)
+    else:
+        checkpoint = load_checkpoint()
+        if not checkpoint:
+            raise SystemExit(f"Erro: nenhum checkpoint em {main.CHECKPOINT_DIR}.")
+        zetas = checkpoint['zetas']
+
+    if args.command == "compile":
+        table, summary = compile_table(zetas, base, args.days, args.samples, args.energy_step,
+                                       args.workers, args.seed, args.method, args.backend)
+        table.save(args.table)
+        print(f"Tabela {args.table}: {summary['entries']} estados de {summary['states']} visitados "
+              f"| {summary['seconds']:.1f} s ({summary['method']}/{summary['backend']})")
+        if args.validate_days:
+            print_validation(validate_table(table, zetas, base, args.validate_days, args.seed + 1,
+                                            args.method, args.backend, args.workers))
+    else:
+        table = DecisionTable.load(args.table)
+        print_validation(validate_table(table, zetas, base, args.days, args.seed,
+                                        args.method, args.backend, args.workers))
@@ -0,0 +1,253 @@
+import argparse
+import math
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from assignment import ev_terms, evaluate_decisions
+from solver import solve_decision_model
+
+# ==========================================
+# DECOMPOSIÇÃO DO MODELO DE DECISÃO (PÁTIOS GRANDES)
+# ==========================================
+# Os carregadores são divididos em grupos (nível 3 x nível 2, baias físicas
+# ou uma partição explícita) e cada VE candidato é pré-atribuído a um único
+# grupo. Como o objetivo se separa por par (ver assignment.py), a prioridade
+# de um VE no grupo g é o valor do par
+#     z1 - z2 - z4*urg_j + (preço - z3)*min(P_g*tau/60, d_j),
+# ou seja, urgência e demanda ponderadas pelos zetas atuais. Do VE mais
+# valioso ao menos, cada um vai ao grupo onde vale mais e ainda tem conector;
+# os restantes completam os grupos até `slack` VEs por conector.
+# Os subproblemas são resolvidos em paralelo (pool de processos) e a
+# reconciliação junta as decisões, aplica o GridLimit do site cortando a
+# taxa dos VEs menos urgentes e recalcula o objetivo do modelo completo.
+
+
+def group_chargers(chargers, groups='level3', bays=None):
+    """
+    Partição dos carregadores. `groups`:
+      - 'level3': nível 3 x demais;
+      - 'bay':    por baia, com `bays` = {charger_id: baia};
+      - função charger -> chave;
+      - lista de listas de IDs de carregadores.
+    """
+    if groups == 'level3':
+        key = lambda c: c.is_level_3
+    elif groups == 'bay':
+        if bays is None:
+            raise ValueError("groups='bay' exige o mapa `bays`")
+        key = lambda c: bays[c.id]
+    elif callable(groups):
+        key = groups
+    else:
+        by_id = {c.id: c for c in chargers}
+        return [[by_id[i] for i in ids] for ids in groups if ids]
+
+    parts = defaultdict(list)
+    for c in chargers:
+        parts[key(c)].append(c)
+    return list(parts.values())
+
+
+def preassign(evs, groups, current_epoch, energy_price, zetas, tau=15, slack=2.0):
+    """Distribui os VEs candidatos entre os grupos. Retorna uma lista de IDs por grupo."""
+    h = tau / 60.0
+    need, urg, cands = ev_terms(evs, current_epoch)
+    power = [max(c.max_power for c in g) for g in groups]
+    slots = [sum(c.num_connectors for c in g) for g in groups]
+
+    def value(j, p):
+        e = min(p * h, need[j]) if energy_price < zetas[3] else 0.0
+        return zetas[1] - zetas[2] - zetas[4] * urg[j] + (energy_price - zetas[3]) * e
+
+    # Grupos do mais rápido ao mais lento; VEs do par mais valioso ao menos.
+    order = sorted(range(len(groups)), key=lambda g: -power[g])
+    ranked = sorted(cands, key=lambda j: (min(value(j, p) for p in power), -urg[j], -need[j]))
+
+    def fill(pending, quota):
+        left = []
+        for j in pending:
+            best = None
+            for g in order:
+                if len(assigned[g]) < quota[g] and (best is None or value(j, power[g]) < value(j, power[best])):
+                    best = g
+            if best is None:
+                left.append(j)
+            else:
+                assigned[best].append(j)
+        return left
+
+    # 1ª passada: um VE por conector (guloso). 2ª: os que sobraram entram
+    # como reserva, até `slack` VEs por conector, para o subproblema trocar.
+    assigned = [[] for _ in groups]
+    left = fill(ranked, slots)
+    fill(left, [math.ceil(slack * n) for n in slots])
+    return assigned
+
+
+def reconcile(results, evs, current_epoch, grid_limit=None):
+    """
+    Junta as decisões dos subproblemas. Conflitos de conector ou de VE (que a
+    pré-atribuição já evita) mantêm a primeira decisão; acima do `grid_limit`
+    (kW) a taxa é cortada a partir do VE menos urgente.
+    """
+    used_slots = set()
+    used_evs = set()
+    decisions = []
+    for group_decisions in results:
+        for d in group_decisions:
+            slot = (d['charger_id'], d['connector_id'])
+            if slot in used_slots or d['ev_id'] in used_evs:
+                continue
+            used_slots.add(slot)
+            used_evs.add(d['ev_id'])
+            decisions.append(dict(d))
+
+    if grid_limit is not None:
+        excess = sum(d['charge_rate'] for d in decisions) - grid_limit
+        if excess > 1e-9:
+            _, urg, _ = ev_terms(evs, current_epoch)
+            for d in sorted(decisions, key=lambda d: urg[d['ev_id']]):
+                cut = min(d['charge_rate'], excess)
+                d['charge_rate'] -= cut
+                excess -= cut
+                if excess <= 1e-9:
+                    break
+    return decisions
+
+
+def _solve_group(evs, chargers, current_epoch, energy_price, zetas, tau, method,
+                 time_limit=None, mip_gap=None, backend='pyomo'):
+    decisions, _, status = solve_decision_model(evs, chargers, current_epoch, energy_price, zetas,
+                                                tau, method=method, time_limit=time_limit,
+                                                mip_gap=mip_gap, return_status=True,
+                                                backend=backend)
+    return decisions, status
+
+
+class DecomposedSolver:
+    """
+    Mesma interface do DecisionModel (pode ser passado ao run_day como
+    `decision_model`). Com `workers` > 1 os subproblemas rodam num pool de
+    processos mantido entre as chamadas; feche com close().
+    """
+
+    def __init__(self, chargers, tau=15, groups='level3', bays=None, method='milp',
+                 workers=None, grid_limit=None, slack=2.0, backend='pyomo'):
+        self.chargers = chargers
+        self.tau = tau
+        self.groups = group_chargers(chargers, groups, bays)
+        self.method = method
+        self.backend = backend
+        self.grid_limit = grid_limit
+        self.slack = slack
+        self.workers = min(workers or len(self.groups), len(self.groups))
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None and self.workers > 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def solve(self, evs, current_epoch, energy_price, zetas, time_limit=None, mip_gap=None,
+              return_status=False, constants=None):
+        # `constants` são agregados do pátio inteiro: só entram no objetivo
+        # final, os subproblemas usam os totais do próprio grupo.
+        start = time.perf_counter()
+        assigned = preassign(evs, self.groups, current_epoch, energy_price, zetas,
+                             self.tau, self.slack)
+        tasks = []
+        for group, ids in zip(self.groups, assigned):
+            if not ids:
+                continue
+            ids = set(ids)
+            tasks.append(([ev for ev in evs if ev.id in ids], group))
+
+        # Os subproblemas rodam em paralelo: todos recebem o tempo que sobra.
+        left = None if time_limit is None else time_limit - (time.perf_counter() - start)
+        pool = self._executor()
+        if pool is None or len(tasks) < 2:
+            solved = [_solve_group(g_evs, group, current_epoch, energy_price, zetas,
+                                   self.tau, self.method, left, mip_gap, self.backend)
+                      for g_evs, group in tasks]
+        else:
+            futures = [pool.submit(_solve_group, g_evs, group, current_epoch, energy_price,
+                                   zetas, self.tau, self.method, left, mip_gap, self.backend)
+                       for g_evs, group in tasks]
+            solved = [f.result() for f in futures]
+
+        decisions = reconcile([r[0] for r in solved], evs, current_epoch, self.grid_limit)
+        obj = evaluate_decisions(decisions, evs, self.chargers, current_epoch, energy_price,
+                                 zetas, self.tau, constants)
+        if not return_status:
+            return decisions, obj
+        status = 'incumbent' if any(r[1] == 'incumbent' for r in solved) else 'optimal'
+        return decisions, obj, status
+
+
+def optimality_gap(evs, chargers, current_epoch, energy_price, zetas, tau=15,
+                   method='milp', grid_limit=None, **kwargs):
+    """Compara a decomposição com o solve monolítico numa instância."""
+    start = time.perf_counter()
+    _, mono = solve_decision_model(evs, chargers, current_epoch, energy_price, zetas, tau,
+                                   method=method, grid_limit=grid_limit)
+    mono_time = time.perf_counter() - start
+
+    with DecomposedSolver(chargers, tau, method=method, grid_limit=grid_limit, **kwargs) as model:
+        start = time.perf_counter()
+        _, dec = model.solve(evs, current_epoch, energy_price, zetas)
+        dec_time = time.perf_counter() - start
+
+    return {'monolithic': mono, 'decomposed': dec,
+            'gap': (dec - mono) / max(1.0, abs(mono)),
+            'monolithic_s': mono_time, 'decomposed_s': dec_time}
+
+
+def measure_gap(n_instances=20, size=(4, 2, 0.5, 40), method='milp', grid_limit=None,
+                seed=0, **kwargs):
+    """Gap relativo da decomposição em instâncias pequenas do benchmark sintético."""
+    from benchmark import BENCH_ZETAS, SyntheticSite
+    from main import HORIZON, PRICES, TAU
+
+    site = SyntheticSite(*size, seed=seed)
+    rows = []
+    for t in site.rng.integers(0, HORIZON - 1, n_instances):
+        evs, chargers = site.snapshot(int(t))
+        rows.append(optimality_gap(evs, chargers, int(t), PRICES[t], BENCH_ZETAS, TAU,
+                                   method, grid_limit, **kwargs))
+    gaps = np.array([r['gap'] for r in rows])
+    return {'instances': len(rows), 'mean_gap': float(gaps.mean()), 'max_gap': float(gaps.max()),
+            'optimal': int(np.sum(gaps <= 1e-6)), 'rows': rows}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gap de otimalidade da decomposição")
+    parser.add_argument("--instances", type=int, default=20)
+    parser.add_argument("--chargers", type=int, default=4)
+    parser.add_argument("--connectors", type=int, default=2)
+    parser.add_argument("--level3", type=float, default=0.5)
+    parser.add_argument("--evs-per-day", type=int, default=40)
+    parser.add_argument("--method", default="milp")
+    parser.add_argument("--grid-limit", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summary = measure_gap(args.instances, (args.chargers, args.connectors, args.level3, args.evs_per_day),
+                          args.method, args.grid_limit, args.seed, workers=args.workers)
+    print(f"Instâncias: {summary['instances']} | ótimas: {summary['optimal']} | "
+          f"gap médio: {summary['mean_gap']:.4%} | gap máx: {summary['max_gap']:.4%}")
@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import stats
+
+import main
+from main import TAU, get_base_scenario, load_checkpoint, run_day
+from scenarios import StochasticDayScenario
+from solver import DecisionModel
+
+# ==========================================
+# AVALIAÇÃO MONTE CARLO DAS POLÍTICAS
+# ==========================================
+# Cada política roda sobre os mesmos dias estocásticos (números aleatórios
+# comuns: a semente do dia fixa o fluxo de chegadas), num pool de processos.
+# As métricas por dia são custo, nível de serviço, pico de carga (kW) e
+# latência média de decisão; o relatório traz médias com intervalos de
+# confiança t de Student e a diferença pareada de custo contra a política
+# de referência. A avaliação para quando o intervalo de cada diferença fica
+# mais estreito que a tolerância pedida.
+
+METRIC_NAMES = ('cost', 'sl', 'peak_kw', 'latency_s')
+
+_decision_model = None  # Modelo persistente de cada processo (políticas ADP)
+
+
+def _init_worker(needs_model=True):
+    global _decision_model
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Só as políticas ADP usam o modelo (e carregam o Pyomo).
+    if needs_model and main.PERSISTENT_MODEL and main.DECISION_METHOD == 'milp' and main.SOLVER_BACKEND == 'pyomo':
+        _decision_model = DecisionModel(get_base_scenario()[1], TAU)
+
+
+def day_seeds(base_seed, start, count):
+    """Sementes reprodutíveis dos dias [start, start + count)."""
+    return [int(np.random.SeedSequence([base_seed, i]).generate_state(1)[0])
+            for i in range(start, start + count)]
+
+
+def _evaluate_days(policies, seeds):
+    """Roda todas as políticas em cada dia. Retorna {política: [[métricas], ...]}."""
+    rows = {name: [] for name in policies}
+    for seed in seeds:
+        for name, (strategy, zetas) in policies.items():
+            res = run_day(strategy, zetas, scenario=StochasticDayScenario(get_base_scenario, seed),
+                          decision_model=_decision_model if strategy == 'ADP' else None)
+            rows[name].append([res['cost'], res['sl'], float(np.max(res['load'])) / (TAU / 60.0),
+                               res['cpu']])
+    return rows
+
+
+def confidence_interval(samples, confidence=0.95):
+    """(média, meia-largura) do intervalo t de Student."""
+    samples = np.asarray(samples, dtype=float)
+    n = len(samples)
+    mean = float(samples.mean())
+    if n < 2:
+        return mean, float('inf')
+    sem = samples.std(ddof=1) / np.sqrt(n)
+    return mean, float(stats.t.ppf(0.5 + confidence / 2, n - 1) * sem)
+
+
+def summarize(data, baseline, confidence=0.95):
+    report = {'days': len(next(iter(data.values()))), 'policies': {}, 'differences': {}}
+    for name, rows in data.items():
+        arr = np.asarray(rows)
+        report['policies'][name] = {
+            metric: dict(zip(('mean', 'half_width'), confidence_interval(arr[:, k], confidence)))
+            for k, metric in enumerate(METRIC_NAMES)
+        }
+    base_cost = np.asarray(data[baseline])[:, 0]
+    for name, rows in data.items():
+        if name == baseline:
+            continue
+        diff = np.asarray(rows)[:, 0] - base_cost   # Pareada: mesmos dias
+        mean, hw = confidence_interval(diff, confidence)
+        report['differences'][f"{name} - {baseline}"] = {
+            'mean': mean, 'half_width': hw,
+            'significant': abs(mean) > hw,
+        }
+    return report
+
+
+def _converged(report, baseline, rel_tol, abs_tol):
+    scale = abs(report['policies'][baseline]['cost']['mean'])
+    tol = abs_tol if abs_tol is not None else rel_tol * max(scale, 1.0)
+    return all(d['half_width'] <= tol for d in report['differences'].values())
+
+
+def evaluate_policies(policies, max_days=5000, min_days=100, batch_days=None, workers=None,
+                      seed=0, confidence=0.95, rel_tol=0.01, abs_tol=None, baseline='EDLD'):
+    """
+    `policies`: {nome: (estratégia do run_day, zetas ou None)}. Avalia em
+    lotes de `batch_days` dias até `max_days`, parando antes quando a meia-
+    largura de toda diferença de custo contra `baseline` fica abaixo de
+    `abs_tol` (ou `rel_tol` x custo médio da referência), após `min_days`.
+    """
+    if baseline not in policies:
+        raise ValueError(f"Política de referência ausente: {baseline}")
+    workers = workers or os.cpu_count()
+    batch_days = batch_days or max(workers * 8, min_days)
+    chunk = max(1, batch_days // (workers * 4))
+
+    data = {name: [] for name in policies}
+    report = None
+    start = time.time()
+    done = 0
+    needs_model = any(strategy == 'ADP' for strategy, _ in policies.values())
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(needs_model,)) as pool:
+        while done < max_days:
+            n = min(batch_days, max_days - done)
+            seeds = day_seeds(seed, done, n)
+            futures = [pool.submit(_evaluate_days, policies, seeds[i:i + chunk])
+                       for i in range(0, n, chunk)]
+            for f in futures:   # Em ordem: o resultado não depende do escalonamento
+                for name, rows in f.result().items():
+                    data[name].extend(rows)
+            done += n
+
+            report = summarize(data, baseline, confidence)
+            diffs = " | ".join(f"{k}: {d['mean']:+.2f} ± {d['half_width']:.2f}"
+                               for k, d in report['differences'].items())
+            print(f"Dias {done}: {diffs} ({time.time() - start:.0f}s)")
+            if done >= min_days and _converged(report, baseline, rel_tol, abs_tol):
+                report['stopped_early'] = done < max_days
+                break
+
+    report.setdefault('stopped_early', False)
+    report['elapsed_s'] = time.time() - start
+    report['confidence'] = confidence
+    return report
+
+
+def print_report(report):
+    print(f"\n>>> {report['days']} dias | IC {report['confidence']:.0%}")
+    for name, m in report['policies'].items():
+        print(f"{name:<12} Custo: ${m['cost']['mean']:.2f} ± {m['cost']['half_width']:.2f} | "
+              f"Nível Serviço: {m['sl']['mean']:.1f}% ± {m['sl']['half_width']:.1f} | "
+              f"Pico: {m['peak_kw']['mean']:.1f} kW | "
+              f"Latência: {m['latency_s']['mean']*1e3:.2f} ms")
+    for name, d in report['differences'].items():
+        verdict = "significativa" if d['significant'] else "não significativa"
+        print(f"{name}: {d['mean']:+.2f} ± {d['half_width']:.2f} ({verdict})")
+
+
+def _load_zetas(path):
+    with open(path, 'r') as f:
+        return np.array(json.load(f)['zetas'])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Avaliação Monte Carlo das políticas")
+    parser.add_argument("--checkpoint", action="append", default=[],
+                        help="JSON de checkpoint com zetas (repetível); padrão: o mais recente")
+    parser.add_argument("--baselines", default="EDLD,FCLD")
+    parser.add_argument("--max-days", type=int, default=5000)
+    parser.add_argument("--min-days", type=int, default=100)
+    parser.add_argument("--batch-days", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--rel-tol", type=float, default=0.01)
+    parser.add_argument("--abs-tol", type=float, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    policies = {}
+    if args.checkpoint:
+        for path in args.checkpoint:
+            policies[f"ADP:{os.path.basename(path)}"] = ('ADP', _load_zetas(path))
+    else:
+        checkpoint = load_checkpoint()
+        if not checkpoint:
+            raise SystemExit("Nenhum checkpoint encontrado.")
+        policies['ADP'] = ('ADP', checkpoint['zetas'])
+    baselines = [b for b in args.baselines.split(',') if b]
+    for rule in baselines:
+        policies[rule] = (rule, None)
+
+    # Sem regras, a referência é a primeira política (como no cli.py evaluate).
+    baseline = baselines[0] if baselines else next(iter(policies))
+    report = evaluate_policies(policies, args.max_days, args.min_days, args.batch_days,
+                               args.workers, args.seed, args.confidence, args.rel_tol,
+                               args.abs_tol, baseline=baseline)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -1,5 +1,7 @@
 import numpy as np
 
+from instrumentation import METRICS
+
 class FeatureExtractor:
     def __init__(self, tau_minutes=15):
         self.tau = tau_minutes
@@ -8,6 +10,7 @@ class FeatureExtractor:
         """
         Retorna vetor phi normalizado.
         """
+        t0 = METRICS.clock()
         phi_0 = 1.0 # Bias
         
         # 1. Scheduled EVs
@@ -31,5 +34,106 @@ class FeatureExtractor:
         total_day_minutes = 96 * self.tau
         current_minutes = current_epoch * self.tau
         phi_5 = current_minutes / total_day_minutes
+        METRICS.stop('features', t0)
+
+        return [phi_0, phi_1, phi_2, phi_3, phi_4, phi_5]
+
+class FeatureState:
+    """
+    Agregados das features mantidos por eventos (chegada, conexão, carga,
+    partida), sem varrer VEs e carregadores a cada época. A urgência é
+    guardada como contagem de VEs por época de partida (no máximo uma
+    entrada por época do dia). Com `verify`, phi() confere o resultado
+    contra FeatureExtractor.get_basis_functions.
+    """
+
+    def __init__(self, chargers, tau_minutes=15, verify=False):
+        self.tau = tau_minutes
+        self.verify = verify
+        self.extractor = FeatureExtractor(tau_minutes) if verify else None
+        self.mismatches = 0
+
+        self.n_slots = sum(c.num_connectors for c in chargers)
+        self.connected = sum(len(c.connected_evs) for c in chargers)
+        self.n_assigned = 0
+        self.total_need = 0.0
+        self.departures = {}             # partida -> nº de VEs presentes
+        self.unassigned_departures = {}  # partida -> nº de VEs sem carregador
+
+    @staticmethod
+    def _bump(counts, key, delta):
+        n = counts.get(key, 0) + delta
+        if n:
+            counts[key] = n
+        else:
+            del counts[key]
+
+    # --- Eventos ---
+
+    def on_arrival(self, ev):
+        self.total_need += ev.current_energy_needed
+        self._bump(self.departures, ev.departure_time, 1)
+        if ev.assigned_charger_id is None:
+            self._bump(self.unassigned_departures, ev.departure_time, 1)
+        else:
+            self.n_assigned += 1
+
+    def on_departure(self, ev):
+        self.total_need -= ev.current_energy_needed
+        self._bump(self.departures, ev.departure_time, -1)
+        if ev.assigned_charger_id is None:
+            self._bump(self.unassigned_departures, ev.departure_time, -1)
+        else:
+            self.n_assigned -= 1
+
+    def reset_connections(self):
+        self.connected = 0
+
+    def on_connect(self, ev):
+        """Chamar antes de gravar ev.assigned_charger_id."""
+        self.connected += 1
+        if ev.assigned_charger_id is None:
+            self.n_assigned += 1
+            self._bump(self.unassigned_departures, ev.departure_time, -1)
+
+    def on_charge(self, ev, energy):
+        self.total_need -= energy
+
+    # --- Consultas ---
+
+    @staticmethod
+    def _urgency(counts, current_epoch):
+        return sum((n / max(dep - current_epoch, 0.1)
+                    for dep, n in counts.items() if dep > current_epoch), 0.0)
+
+    def phi(self, current_epoch, evs=None, chargers=None):
+        phi = [1.0,
+               self.n_assigned,
+               self.n_slots - self.connected,
+               self.total_need,
+               self._urgency(self.unassigned_departures, current_epoch),
+               (current_epoch * self.tau) / (96 * self.tau)]
+        if self.verify and evs is not None:
+            ref = self.extractor.get_basis_functions(evs, chargers, current_epoch)
+            if any(abs(a - b) > 1e-6 * max(1.0, abs(b)) for a, b in zip(phi, ref)):
+                self.mismatches += 1
+                print(f"Aviso: features incrementais divergem na época {current_epoch} "
+                      f"({phi} vs {ref})")
+        return phi
+
+    def solver_constants(self, current_epoch):
+        """
+        Termos do objetivo do MILP que não dependem da decisão: conectores,
+        demanda total, urgência de todos os VEs presentes e feature de tempo.
+        """
+        return {
+            'n_slots': self.n_slots,
+            'total_need': self.total_need,
+            'total_urgency': self._urgency(self.departures, current_epoch),
+            'time': (current_epoch * self.tau) / (96 * self.tau),
+        }
 
-        return [phi_0, phi_1, phi_2, phi_3, phi_4, phi_5]
\ No newline at end of file
+    def constant_term(self, zetas, current_epoch):
+        c = self.solver_constants(current_epoch)
+        return (zetas[0] + zetas[2] * c['n_slots'] + zetas[3] * c['total_need'] +
+                zetas[4] * c['total_urgency'] + zetas[5] * c['time'])
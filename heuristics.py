@@ -1,34 +1,75 @@
-def solve_heuristic(evs, chargers, rule, tau=15):
-    decisions = []
-    # Filtra apenas quem precisa de carga
-    active_evs = [e for e in evs if e.current_energy_needed > 0.001]
-    
-    if not active_evs:
-        return []
+import heapq
+from itertools import count
 
-    # Ordenação baseada na regra
-    if rule == 'FCLD': # First Come, Largest Demand
-        active_evs.sort(key=lambda x: (x.arrival_time, -x.required_energy))
-    elif rule == 'EDLD': # Earliest Due, Largest Demand
-        active_evs.sort(key=lambda x: (x.departure_time, -x.required_energy))
+from instrumentation import METRICS
+
+# Regras de prioridade:
+#   FCLD  - First Come, Largest Demand
+#   EDLD  - Earliest Due, Largest Demand
+#   LLF   - Least Laxity First: folga = horas até a partida - horas de carga
+#           restantes na potência máxima do pátio
+#   PRICE - LLF que adia, no preço alto, quem ainda consegue terminar a carga
+#           depois que o preço cair
+# LLF e PRICE mandam os VEs mais prioritários para os carregadores nível 3.
+RULES = ('FCLD', 'EDLD', 'LLF', 'PRICE')
+LEVEL3_FIRST_RULES = ('LLF', 'PRICE')
+
+
+def _priority(rule, ev, h, ref_power):
+    if rule == 'FCLD':
+        return (ev.arrival_time, -ev.required_energy)
+    if rule == 'EDLD':
+        return (ev.departure_time, -ev.required_energy)
+    # A época atual é comum a todos os VEs: a folga ordena por partida*h - carga/P.
+    return (ev.departure_time * h - ev.current_energy_needed / ref_power, -ev.current_energy_needed)
+
+
+def _next_cheaper(prices):
+    """next_cheaper[t]: primeira época > t com preço menor que prices[t] (ou None)."""
+    result = [None] * len(prices)
+    stack = []
+    for t in range(len(prices) - 1, -1, -1):
+        while stack and prices[stack[-1]] >= prices[t]:
+            stack.pop()
+        result[t] = stack[-1] if stack else None
+        stack.append(t)
+    return result
+
+
+def _can_defer(ev, t, next_cheaper, h, ref_power):
+    """PRICE: esperando a próxima época mais barata, ainda dá para completar a carga?"""
+    t_c = next_cheaper[t] if t < len(next_cheaper) else None
+    if t_c is None or t_c >= ev.departure_time:
+        return False
+    return (ev.departure_time - t_c) * h * ref_power >= ev.current_energy_needed
 
-    # Alocação Gulosa
+
+def _charger_order(chargers, level3_first):
+    if not level3_first:
+        return chargers
+    return sorted(chargers, key=lambda c: (not c.is_level_3, -c.max_power))
+
+
+def _allocate(candidates, chargers, tau):
+    """Alocação gulosa: cada conector livre recebe o próximo VE ainda não alocado."""
+    decisions = []
     allocated_ev_ids = set()
-    
+    queue = iter(candidates)
+
     for charger in chargers:
         available_slots = charger.get_available_connectors()
-        
+
         for k in range(available_slots):
-            # Busca o próximo carro da fila que ainda não foi alocado
-            candidate = next((e for e in active_evs if e.id not in allocated_ev_ids), None)
-            
+            # Próximo carro da fila que ainda não foi alocado (a fila só avança)
+            candidate = next((e for e in queue if e.id not in allocated_ev_ids), None)
+
             if candidate:
                 # Carrega o máximo possível (ASAP)
                 power = min(charger.max_power, candidate.current_energy_needed / (tau/60.0))
-                
+
                 # Descobre qual conector fisico usar (logica sequencial)
                 connector_idx = charger.num_connectors - available_slots + k
-                
+
                 decisions.append({
                     'charger_id': charger.id,
                     'connector_id': connector_idx,
@@ -37,4 +78,136 @@ def solve_heuristic(evs, chargers, rule, tau=15):
                 })
                 allocated_ev_ids.add(candidate.id)
 
-    return decisions
\ No newline at end of file
+    return decisions
+
+
+def solve_heuristic(evs, chargers, rule, tau=15, current_epoch=None, prices=None,
+                    level3_first=None):
+    t0 = METRICS.clock()
+    # Filtra apenas quem precisa de carga
+    active_evs = [e for e in evs if e.current_energy_needed > 0.001]
+
+    if not active_evs:
+        METRICS.stop('heuristic', t0)
+        return []
+
+    h = tau / 60.0
+    ref_power = max(c.max_power for c in chargers) if chargers else 1.0
+
+    # Ordenação baseada na regra
+    if rule in RULES:
+        active_evs.sort(key=lambda x: _priority(rule, x, h, ref_power))
+    if rule == 'PRICE' and prices is not None and current_epoch is not None:
+        next_cheaper = _next_cheaper(prices)
+        active_evs = [e for e in active_evs
+                      if not _can_defer(e, current_epoch, next_cheaper, h, ref_power)]
+
+    if level3_first is None:
+        level3_first = rule in LEVEL3_FIRST_RULES
+    decisions = _allocate(active_evs, _charger_order(chargers, level3_first), tau)
+
+    METRICS.stop('heuristic', t0)
+    METRICS.count('heuristic.decisions', len(decisions))
+    return decisions
+
+
+class HeuristicScheduler:
+    """
+    Versão persistente do solve_heuristic: a fila de prioridade (heap)
+    atravessa as épocas e só muda com eventos (chegada, energia entregue,
+    partida). Cada decisão retira do heap apenas os VEs que ocupam conectores
+    (mais os pulados), em O((conectores + mudanças) log N). Entradas antigas
+    são descartadas preguiçosamente pela versão. Mesmas decisões do
+    solve_heuristic, desde que os VEs sejam adicionados na ordem da lista.
+    """
+
+    def __init__(self, chargers, rule='EDLD', tau=15, prices=None, level3_first=None):
+        self.rule = rule
+        self.tau = tau
+        self.h = tau / 60.0
+        self.ref_power = max(c.max_power for c in chargers) if chargers else 1.0
+        self.next_cheaper = _next_cheaper(prices) if rule == 'PRICE' and prices is not None else None
+        self.level3_first = rule in LEVEL3_FIRST_RULES if level3_first is None else level3_first
+        # Com LLF/PRICE a prioridade depende da demanda restante.
+        self.need_keyed = rule in LEVEL3_FIRST_RULES
+
+        self.heap = []
+        self.entries = {}    # id(ev) -> [ev, versão, ordem de chegada (identifica a entrada)]
+        self._seq = count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _push(self, entry):
+        ev, version, seq = entry
+        key = _priority(self.rule, ev, self.h, self.ref_power) if self.rule in RULES else ()
+        heapq.heappush(self.heap, (key, seq, id(ev), version))
+
+    # --- Eventos ---
+
+    def add(self, ev):
+        if ev.current_energy_needed <= 0.001 or id(ev) in self.entries:
+            return
+        entry = [ev, 0, next(self._seq)]
+        self.entries[id(ev)] = entry
+        self._push(entry)
+
+    def update(self, ev):
+        """Chamar depois de mudar ev.current_energy_needed."""
+        entry = self.entries.get(id(ev))
+        if entry is None:
+            return
+        if ev.current_energy_needed <= 0.001:
+            del self.entries[id(ev)]
+        elif self.need_keyed:
+            entry[1] += 1
+            self._push(entry)
+
+    def remove(self, ev):
+        self.entries.pop(id(ev), None)
+
+    def _compact(self):
+        """Descarta as entradas antigas acumuladas no heap."""
+        self.heap = [item for item in self.heap
+                     if self.entries.get(item[2], (None, None, None))[1:] == [item[3], item[1]]]
+        heapq.heapify(self.heap)
+
+    # --- Decisão ---
+
+    def _pop_valid(self):
+        while self.heap:
+            item = heapq.heappop(self.heap)
+            entry = self.entries.get(item[2])
+            if entry is not None and entry[2] == item[1] and entry[1] == item[3]:
+                return item, entry[0]
+        return None, None
+
+    def decide(self, chargers, current_epoch=None):
+        t0 = METRICS.clock()
+        popped = []
+        allocated_ev_ids = set()
+
+        def candidates():
+            while True:
+                item, ev = self._pop_valid()
+                if item is None:
+                    return
+                popped.append(item)
+                if ev.id in allocated_ev_ids:
+                    continue
+                if (self.next_cheaper is not None and current_epoch is not None and
+                        _can_defer(ev, current_epoch, self.next_cheaper, self.h, self.ref_power)):
+                    continue
+                allocated_ev_ids.add(ev.id)
+                yield ev
+
+        decisions = _allocate(candidates(), _charger_order(chargers, self.level3_first), self.tau)
+
+        # Quem foi retirado continua ativo: volta com a mesma chave e ordem.
+        for item in popped:
+            heapq.heappush(self.heap, item)
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self._compact()
+        METRICS.stop('heuristic', t0)
+        METRICS.count('heuristic.decisions', len(decisions))
+        return decisions
@@ -0,0 +1,125 @@
+import json
+import os
+
+import numpy as np
+
+# ==========================================
+# HISTÓRICO DE ZETAS EM DISCO (MEMMAP, SÓ-ANEXAR)
+# ==========================================
+# As linhas ficam num .npy pré-alocado e mapeado em memória, que dobra de
+# capacidade quando enche. O número de linhas válidas vive num marcador JSON
+# separado, gravado de forma atômica (tmp + os.replace) em flush(): linhas
+# escritas depois do último marcador são ignoradas na retomada.
+
+HISTORY_FILE = "zeta_history.npy"
+PROGRESS_FILE = "zeta_history.progress"  # JSON; fora do padrão *.json dos checkpoints
+INITIAL_CAPACITY = 4096
+COPY_CHUNK = 65536  # Linhas copiadas por vez ao crescer o arquivo
+
+
+class ZetaHistoryStore:
+    """
+    Histórico de zetas com a interface mínima de lista usada pelo treino.
+    `filename`/`progress_file` permitem guardar outras séries de linhas
+    (ex.: as saídas por época do rolling_sim.py).
+    """
+
+    def __init__(self, directory, width=6, mode='r+', filename=HISTORY_FILE,
+                 progress_file=PROGRESS_FILE):
+        self.directory = directory
+        self.width = width
+        self.mode = mode
+        self.path = os.path.join(directory, filename)
+        self.progress_path = os.path.join(directory, progress_file)
+
+        self.rows = 0
+        self._data = None
+
+        if os.path.exists(self.path):
+            self._data = np.load(self.path, mmap_mode=mode)
+            self.width = self._data.shape[1]
+            self.rows = min(self._read_progress(), len(self._data))
+
+    def _read_progress(self):
+        try:
+            with open(self.progress_path, 'r') as f:
+                return int(json.load(f)["rows"])
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    # --- Escrita ---
+
+    def _allocate(self, capacity):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path + ".tmp.npy"
+        new = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float64,
+                                        shape=(capacity, self.width))
+        for start in range(0, self.rows, COPY_CHUNK):
+            stop = min(start + COPY_CHUNK, self.rows)
+            new[start:stop] = self._data[start:stop]
+        new.flush()
+        del new
+        os.replace(tmp_path, self.path)
+        self._data = np.load(self.path, mmap_mode='r+')
+
+    def append(self, zetas):
+        if self.mode == 'r':
+            raise ValueError("Histórico aberto somente para leitura")
+        if self._data is None or self.rows == len(self._data):
+            capacity = INITIAL_CAPACITY if self._data is None else 2 * len(self._data)
+            self._allocate(capacity)
+        self._data[self.rows] = zetas
+        self.rows += 1
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.width)
+        if self.mode == 'r':
+            raise ValueError("Histórico aberto somente para leitura")
+        needed = self.rows + len(rows)
+        capacity = INITIAL_CAPACITY if self._data is None else len(self._data)
+        if self._data is None or needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            self._allocate(capacity)
+        self._data[self.rows:needed] = rows
+        self.rows = needed
+
+    def clear(self):
+        """Descarta as linhas (efetivado em disco no próximo flush)."""
+        self.rows = 0
+
+    def flush(self):
+        """Persiste as linhas e grava o marcador de progresso atomicamente."""
+        if self._data is not None and self.mode != 'r':
+            self._data.flush()
+        if self.mode == 'r':
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.progress_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"rows": self.rows, "width": self.width}, f)
+        os.replace(tmp_path, self.progress_path)
+
+    # --- Leitura (sem materializar o arquivo) ---
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, idx):
+        return self.view()[idx]
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def view(self, start=0, stop=None, step=1):
+        """Fatia do memmap (sem cópia) das linhas válidas."""
+        if self._data is None:
+            return np.zeros((0, self.width))
+        return self._data[:self.rows][start:stop:step]
+
+    def downsample(self, max_points):
+        """Visão espaçada com no máximo `max_points` linhas."""
+        if self.rows <= max_points:
+            return self.view()
+        step = -(-self.rows // max_points)
+        return self.view(step=step)
@@ -0,0 +1,126 @@
+import json
+import time
+from collections import defaultdict
+
+# ==========================================
+# INSTRUMENTAÇÃO DO CAMINHO QUENTE
+# ==========================================
+# Temporizadores por fase e contadores, acumulados entre duas chamadas de
+# log_iteration(), que grava uma linha JSON compacta por iteração de treino.
+# Desligado (padrão), phase() devolve um contexto nulo compartilhado e
+# count()/clock()/stop() retornam na primeira linha: o custo é uma checagem
+# de atributo.
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.timers[self.name] += time.perf_counter() - self.start
+        self.metrics.calls[self.name] += 1
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.timers = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(float)
+        self._log = None
+        self._start = None
+        self._iterations = 0
+
+    def enable(self, path=None):
+        """Liga a coleta; com `path`, anexa uma linha JSON por iteração."""
+        self.enabled = True
+        self._start = time.perf_counter()
+        self._iterations = 0
+        if path:
+            self._log = open(path, 'a', buffering=1)
+
+    def disable(self):
+        self.enabled = False
+        if self._log:
+            self._log.close()
+            self._log = None
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        self.counters[name] += value
+
+    def clock(self):
+        """Início de uma medição manual (0.0 se desligado); ver stop()."""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, name, start):
+        if not self.enabled:
+            return
+        self.timers[name] += time.perf_counter() - start
+        self.calls[name] += 1
+
+    def merge(self, snapshot):
+        """Soma um snapshot() vindo de outro processo."""
+        if not self.enabled or not snapshot:
+            return
+        for k, v in snapshot['phases'].items():
+            self.timers[k] += v
+        for k, v in snapshot['calls'].items():
+            self.calls[k] += v
+        for k, v in snapshot['counts'].items():
+            self.counters[k] += v
+
+    def reset(self):
+        self.timers.clear()
+        self.calls.clear()
+        self.counters.clear()
+
+    def snapshot(self):
+        return {
+            'phases': {k: round(v, 6) for k, v in self.timers.items()},
+            'calls': dict(self.calls),
+            'counts': dict(self.counters),
+        }
+
+    def log_iteration(self, iteration, **fields):
+        """Grava (e zera) as métricas acumuladas desde a última iteração."""
+        if not self.enabled:
+            return None
+        self._iterations += 1
+        elapsed = time.perf_counter() - self._start
+        record = {'it': iteration, 'wall': round(elapsed, 3),
+                  'it_s': round(self._iterations / elapsed, 3) if elapsed > 0 else None}
+        record.update(fields)
+        record.update(self.snapshot())
+        if self._log:
+            self._log.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.reset()
+        return record
+
+
+METRICS = Metrics()
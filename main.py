@@ -1,6 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
 import random
 import time
 import json
@@ -9,9 +7,13 @@ import sys
 
 # Importações do projeto
 from classes import EV, Charger
-from features import FeatureExtractor
-from solver import solve_decision_model
-from heuristics import solve_heuristic
+from features import FeatureExtractor, FeatureState
+from solver import solve_decision_model, solve_with_deadline, DecisionModel, PROVENANCE
+from heuristics import solve_heuristic, HeuristicScheduler
+from adp_update import ConvergenceMonitor, StepSize, ZetaUpdater, discounted_returns
+from decision_cache import DecisionCache
+from history_store import ZetaHistoryStore
+from instrumentation import METRICS
 
 # ==========================================
 # 1. CONFIGURAÇÕES
@@ -21,11 +23,44 @@ CHECKPOINT_DIR = "checkpoints"
 MAX_CHECKPOINT_FILES = 20
 STATE_FILE = os.path.join(CHECKPOINT_DIR, "training_state.npz")
 CHECKPOINT_INTERVAL = 500
+MAX_PLOT_POINTS = 5000  # Linhas do histórico usadas no gráfico de convergência
 HORIZON = 96            # 24h
 TAU = 15                # 15 min
 ALPHA = 0.01            # Taxa de aprendizado (Lento e estável)
+STEP_RULE = 'constant'  # Passo do modo 'alpha': 'constant' (ALPHA), 'harmonic', 'stc' ou 'kesten'
+STEP_PARAMS = {}        # Parâmetros da regra (padrões em adp_update.StepSize.DEFAULTS)
+STEP_MIN = 0.0          # Menor passo permitido às regras adaptativas
 GAMMA = 0.99            # Fator de desconto
+UPDATE_MODE = 'alpha'   # Atualização dos zetas: 'alpha', 'rls' ou 'batch'
+RLS_FORGETTING = 0.999  # Fator de esquecimento do modo 'rls'
+DECISION_CACHE = False  # Memoriza decisões por estado quantizado no treino
+CACHE_SIZE = 100_000    # Máximo de entradas (LRU)
+CACHE_ENERGY_STEP = 0.5 # Quantização da demanda restante (kWh)
+CACHE_ZETA_TOL = 0.05   # Variação máxima dos zetas antes de esvaziar o cache
+DECISION_TABLE = None   # Tabela compilada (decision_table.py) consultada antes do solver fora do treino
 PENALTY = 200.0         # Multa alta
+PERSISTENT_MODEL = True # Reaproveita o modelo de decisão entre épocas/dias no treino
+DECISION_METHOD = 'milp' # 'milp', 'reduced', 'fast' (atribuição exata) ou 'check'
+SOLVER_BACKEND = 'pyomo' # 'pyomo' (GLPK via arquivos) ou 'highs' (scipy.optimize.milp em processo)
+EVENT_DRIVEN = True     # Épocas ociosas (nenhum VE com demanda) não chamam solver/heurística.
+                        # As 96 épocas continuam no laço (features e custos por época do treino);
+                        # não há salto até o próximo evento nem reuso da decisão quando só o preço
+                        # muda: a urgência 1/(partida - t) muda a decisão ADP a cada época.
+DECISION_DEADLINE = None # Prazo (s) por decisão ADP; esgotado, usa o incumbente ou FALLBACK_RULE
+MIP_GAP = None          # Gap relativo aceito pelo solver (None = padrão do solver)
+FALLBACK_RULE = 'EDLD'  # Heurística usada quando o solver não entrega solução
+FALLBACK_ON_ERROR = False # Também usa FALLBACK_RULE se o solver falhar (ausente, erro); senão relança
+HEAP_SCHEDULER = True   # Heurísticas com fila de prioridade persistente no run_day
+INCREMENTAL_FEATURES = True # Features mantidas por eventos (FeatureState) no run_day
+VERIFY_FEATURES = False # Confere as features incrementais contra a varredura completa
+METRICS_FILE = None     # Ex.: "training_metrics.jsonl" liga a telemetria por iteração
+# Critério opcional de parada. No histórico de 50k iterações em checkpoints/
+# a deriva entre metades da janela fica em 0.1-0.4 (1k a 10k iterações), então
+# com estes valores o treino na prática segue até o limite ou o Ctrl+C.
+CONVERGENCE_TOL = 0.01  # Deriva relativa dos zetas na janela para parar o treino (None = nunca para)
+CONVERGENCE_RESIDUAL_TOL = 0.05 # Variação relativa máxima da mediana do resíduo da regressão
+CONVERGENCE_WINDOW = 1000 # Iterações na janela móvel da convergência
+CONVERGENCE_MIN_ITER = 2000 # Nunca para antes disso
 
 # Preço: Pico entre 17h e 20h
 PRICES = [0.50 if (17 <= (t*15)/60 < 20) else 0.15 for t in range(HORIZON)]
@@ -40,6 +75,21 @@ def _warn_and_move_corrupted(path):
     return corrupted_path
 
 
+def open_history():
+    """Histórico de zetas em disco (memmap), ao lado dos checkpoints."""
+    return ZetaHistoryStore(CHECKPOINT_DIR)
+
+
+def _migrate_history(rows):
+    """Copia um histórico em memória (formatos antigos) para o memmap."""
+    history = open_history()
+    history.clear()
+    if len(rows):
+        history.extend(np.stack(rows))
+    history.flush()
+    return history
+
+
 def _load_training_state():
     if not os.path.exists(STATE_FILE):
         return None
@@ -48,15 +98,33 @@ def _load_training_state():
         with np.load(STATE_FILE) as data:
             iteration = int(data["iteration"])
             zetas = np.array(data["zetas"])
-            history = [np.array(row) for row in np.atleast_2d(data["history"])]
+            step_k = int(data["step_k"]) if "step_k" in data else 1
+            seed_index = int(data["seed_index"]) if "seed_index" in data else None
+            accumulators = None
+            if "updater_R" in data:
+                accumulators = {"mode": str(data["updater_mode"]),
+                                "R": np.array(data["updater_R"]),
+                                "r": np.array(data["updater_r"])}
+            legacy_history = np.atleast_2d(data["history"]) if "history" in data else None
     except Exception:
         _warn_and_move_corrupted(STATE_FILE)
         return None
 
+    if legacy_history is not None:
+        # Formato antigo: histórico inteiro dentro do .npz. Migra para o memmap
+        # e regrava o estado sem ele.
+        history = _migrate_history(legacy_history)
+        save_training_state(zetas, iteration, history)
+    else:
+        history = open_history()
+
     return {
         "zetas": zetas,
         "iteration": iteration,
-        "history": history
+        "history": history,
+        "step_k": step_k,
+        "seed_index": seed_index,
+        "accumulators": accumulators
     }
 
 
@@ -72,7 +140,7 @@ def _load_legacy_checkpoint():
         return None
 
     history = data.get("history", []) or [data.get("zetas", [])]
-    history = [np.array(z) for z in history]
+    history = _migrate_history([np.array(z) for z in history])
 
     result = {
         "zetas": np.array(data["zetas"]),
@@ -100,18 +168,36 @@ def _list_checkpoint_files():
     return files
 
 
-def save_training_state(zetas, iteration, history):
+def save_training_state(zetas, iteration, history, step_k=None, seed_index=None,
+                        accumulators=None):
     if not history:
         return
 
+    if not isinstance(history, ZetaHistoryStore):
+        history = _migrate_history(history)
+
+    # O histórico já está no memmap: só o marcador de progresso é gravado.
+    history.flush()
+
     os.makedirs(CHECKPOINT_DIR, exist_ok=True)
-    hist_arr = np.stack(history)
     tmp_path = os.path.join(CHECKPOINT_DIR, "training_state.tmp.npz")
-    np.savez_compressed(
+    extra = {}
+    if step_k is not None:
+        extra["step_k"] = np.array(step_k, dtype=np.int64)
+    if seed_index is not None:
+        # Treino paralelo: próximo índice de semente a submeter. Só é
+        # gravado se o chamador o repassar (retomada); reiniciar o descarta.
+        extra["seed_index"] = np.array(seed_index, dtype=np.int64)
+    if accumulators is not None:
+        # Modos 'rls'/'batch': equações normais acumuladas (ZetaUpdater.state)
+        extra["updater_mode"] = np.array(accumulators["mode"])
+        extra["updater_R"] = np.asarray(accumulators["R"], dtype=float)
+        extra["updater_r"] = np.asarray(accumulators["r"], dtype=float)
+    np.savez(
         tmp_path,
         iteration=np.array(iteration, dtype=np.int64),
         zetas=np.array(zetas),
-        history=hist_arr
+        **extra
     )
     os.replace(tmp_path, STATE_FILE)
 
@@ -143,6 +229,29 @@ def save_checkpoint(zetas, iteration):
         os.remove(files.pop(0))
 
 
+def read_latest_zetas():
+    """
+    Só leitura: zetas e iteração mais recentes, sem migrar, regravar ou mover
+    arquivos nem abrir o histórico (seguro com um treino gravando ao lado).
+    Retorna {"zetas", "iteration"} ou None.
+    """
+    try:
+        with np.load(STATE_FILE) as data:
+            return {"zetas": np.array(data["zetas"]), "iteration": int(data["iteration"])}
+    except Exception:
+        pass
+
+    legacy = [CHECKPOINT_FILE] if os.path.isfile(CHECKPOINT_FILE) else []
+    for path in reversed(legacy + _list_checkpoint_files()):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            return {"zetas": np.array(data["zetas"]), "iteration": data.get("iteration", 0)}
+        except (OSError, ValueError, KeyError):
+            continue
+    return None
+
+
 def load_checkpoint():
     """Carrega o cérebro da IA do disco."""
     state = _load_training_state()
@@ -176,6 +285,7 @@ def load_checkpoint():
     if latest is None:
         return None
 
+    history = _migrate_history(history)
     save_training_state(latest["zetas"], latest["iteration"], history)
 
     return {
@@ -192,8 +302,62 @@ def get_base_scenario():
     evs = [EV(1, 0, 32, 40.0, 40.0), EV(2, 0, 90, 60.0, 60.0)]
     return evs, chargers
 
-def run_day(strategy, zetas=None, training=False):
-    evs, chargers = get_base_scenario()
+def _adp_decision(evs, chargers, t, zetas, decision_model=None, cache=None, fstate=None,
+                  price=None):
+    """
+    Decisão ADP da época t, via modelo persistente ou solve_decision_model.
+    Retorna (decisões, objetivo, origem); ver solver.solve_with_deadline.
+    `price` (padrão PRICES[t]) permite curvas de preço de outros dias.
+    """
+    provenance = ['cached']
+    price = PRICES[t] if price is None else price
+
+    # Agregados da parte constante do objetivo, já mantidos pelo FeatureState
+    constants = fstate.solver_constants(t) if fstate is not None else None
+
+    def solve():
+        decisions, obj, provenance[0] = solve_with_deadline(
+            evs, chargers, t, price, zetas, TAU, DECISION_METHOD, DECISION_DEADLINE,
+            MIP_GAP, FALLBACK_RULE, decision_model, SOLVER_BACKEND, FALLBACK_ON_ERROR,
+            constants)
+        return decisions, obj
+
+    if cache is None:
+        decisions, obj = solve()
+    else:
+        constant = fstate.constant_term(zetas, t) if fstate is not None else None
+        decisions, obj = cache.lookup_or_solve(solve, evs, chargers, t, price, zetas, constant)
+        if provenance[0] in ('incumbent', 'fallback'):
+            # Só soluções ótimas ficam no cache.
+            cache.forget(evs, chargers, t, price)
+    METRICS.count(f'decision.{provenance[0]}')
+    return decisions, obj, provenance[0]
+
+_decision_table = None  # Tabela de DECISION_TABLE, carregada uma vez por processo
+
+def load_decision_table():
+    global _decision_table
+    if _decision_table is None or _decision_table.path != DECISION_TABLE:
+        from decision_table import DecisionTable
+        _decision_table = DecisionTable.load(DECISION_TABLE)
+    return _decision_table
+
+def _drop_departed(evs, t, fstate=None, scheduler=None):
+    """Remove os VEs que partem na época t (avisando FeatureState e escalonador)."""
+    if fstate is not None or scheduler is not None:
+        for e in evs:
+            if e.departure_time <= t:
+                if fstate is not None: fstate.on_departure(e)
+                if scheduler is not None: scheduler.remove(e)
+    return [e for e in evs if e.departure_time > t]
+
+def run_day(strategy, zetas=None, training=False, decision_model=None, cache=None,
+            scenario=None):
+    # `scenario` (opcional) fornece o pátio inicial e as chegadas de cada época:
+    # scenario.initial() -> (evs, chargers) e scenario.arrivals(t) -> [EV, ...]
+    evs, chargers = scenario.initial() if scenario is not None else get_base_scenario()
+    if strategy == 'ADP' and cache is None and DECISION_TABLE and not training:
+        cache = load_decision_table()
     
     total_cost = 0.0
     total_energy = 0.0
@@ -203,44 +367,86 @@ def run_day(strategy, zetas=None, training=False):
     feats_hist = []
     step_costs = []
     cpu_times = []
+    provenance = dict.fromkeys(PROVENANCE + ('cached',), 0)
     
     extractor = FeatureExtractor(TAU)
+    fstate = None
+    if INCREMENTAL_FEATURES:
+        fstate = FeatureState(chargers, TAU, verify=VERIFY_FEATURES)
+        for ev in evs: fstate.on_arrival(ev)
+    scheduler = None
+    if HEAP_SCHEDULER and strategy != 'ADP':
+        scheduler = HeuristicScheduler(chargers, strategy, TAU, PRICES)
+        for ev in evs: scheduler.add(ev)
 
     for t in range(HORIZON):
         # Chegadas
         new_evs = []
-        if training:
+        if scenario is not None:
+            new_evs.extend(scenario.arrivals(t))
+        elif training:
             if random.random() < 0.15:
-                new_evs.append(EV(len(evs)+100, t, min(96, t+35), 30.0, 30.0))
+                # ID único por época (no máximo uma chegada por época)
+                new_evs.append(EV(100 + t, t, min(96, t+35), 30.0, 30.0))
         elif t == 68: # Teste às 17:00
             new_evs.append(EV(200, t, 92, 45.0, 45.0))
             
         evs.extend(new_evs)
+        if fstate is not None:
+            for ev in new_evs: fstate.on_arrival(ev)
+        if scheduler is not None:
+            for ev in new_evs: scheduler.add(ev)
         if not training: total_req += sum(e.required_energy for e in new_evs)
 
         # Features
         if strategy == 'ADP' or training:
-            feats_hist.append(extractor.get_basis_functions(evs, chargers, t))
+            if fstate is not None:
+                feats_hist.append(fstate.phi(t, evs, chargers))
+            else:
+                feats_hist.append(extractor.get_basis_functions(evs, chargers, t))
+
+        # Época ociosa: sem VE com demanda, toda estratégia decide [] e nada
+        # é cobrado (a multa exige demanda > 0.1). Só a ocupação é zerada.
+        if EVENT_DRIVEN and not any(e.current_energy_needed > 0.001 for e in evs):
+            for c in chargers: c.connected_evs = {}
+            if fstate is not None: fstate.reset_connections()
+            step_costs.append(0.0)
+            METRICS.count('sim.idle_epochs')
+            evs = _drop_departed(evs, t, fstate, scheduler)
+            continue
 
         # Decisão
         start = time.time()
+        start_m = METRICS.clock()
         if strategy == 'ADP':
-            decs, _ = solve_decision_model(evs, chargers, t, PRICES[t], zetas, TAU)
+            decs, _, origin = _adp_decision(evs, chargers, t, zetas, decision_model, cache, fstate)
+            provenance[origin] += 1
+        elif scheduler is not None:
+            decs = scheduler.decide(chargers, t)
         else:
-            decs = solve_heuristic(evs, chargers, strategy, TAU)
+            decs = solve_heuristic(evs, chargers, strategy, TAU, t, PRICES)
         cpu_times.append(time.time() - start)
+        METRICS.stop('sim.decision', start_m)
+        METRICS.count('sim.decisions', len(decs))
+        METRICS.count('sim.active_evs', len(evs))
 
         # Física
+        phys_start = METRICS.clock()
         step_c = 0.0
         step_e = 0.0
         for c in chargers: c.connected_evs = {} 
+        if fstate is not None: fstate.reset_connections()
 
         for d in decs:
             charger = next(c for c in chargers if c.id == d['charger_id'])
             charger.connected_evs[d['connector_id']] = d['ev_id']
             ev = next(e for e in evs if e.id == d['ev_id'])
             energy = min(d['charge_rate']*(TAU/60.0), ev.current_energy_needed)
+            if fstate is not None:
+                fstate.on_connect(ev)
+                fstate.on_charge(ev, energy)
             ev.current_energy_needed -= energy
+            if scheduler is not None: scheduler.update(ev)
             ev.assigned_charger_id = d['charger_id']
             step_c += energy * PRICES[t]
             step_e += energy
@@ -254,18 +460,24 @@ def run_day(strategy, zetas=None, training=False):
         total_energy += step_e
         load_profile[t] = step_e
         step_costs.append(step_c)
-        evs = [e for e in evs if e.departure_time > t]
+        evs = _drop_departed(evs, t, fstate, scheduler)
+        METRICS.stop('sim.physics', phys_start)
 
     sl = (total_energy / total_req * 100) if total_req > 0 else 100
+    # Latência média por decisão: épocas ociosas (sem decisão) não entram.
     avg_cpu = sum(cpu_times)/len(cpu_times) if cpu_times else 0
     
     return {'cost': total_cost, 'sl': sl, 'load': load_profile, 
-            'feats': feats_hist, 'step_costs': step_costs, 'cpu': avg_cpu}
+            'feats': feats_hist, 'step_costs': step_costs, 'cpu': avg_cpu,
+            'decision_epochs': len(cpu_times),
+            'provenance': provenance}
 
 # ==========================================
 # 4. FUNÇÃO DE PLOTAGEM (FINALIZAÇÃO)
 # ==========================================
-def generate_final_report(zetas, zeta_history):
+def generate_final_report(zetas, zeta_history, output_dir='.'):
+    import matplotlib.pyplot as plt
+
     print("\n>>> Gerando Relatórios e Gráficos...")
     
     # Testes Comparativos
@@ -278,11 +490,13 @@ def generate_final_report(zetas, zeta_history):
     # Fig 3: Convergência
     plt.figure(figsize=(12,5))
     if len(zeta_history) > 0:
-        plt.plot(zeta_history)
+        # Leitura espaçada do memmap: não carrega o histórico inteiro.
+        step = max(1, -(-len(zeta_history) // MAX_PLOT_POINTS))
+        plt.plot(np.arange(0, len(zeta_history), step), zeta_history.view(step=step))
         plt.legend(['Bias','Sched','Conn','Rem','Urg','Time'])
         plt.title(f'Convergência dos Pesos ({len(zeta_history)} iterações)')
         plt.grid(alpha=0.3)
-        plt.savefig('fig3_convergencia.png')
+        plt.savefig(os.path.join(output_dir, 'fig3_convergencia.png'))
 
     # Fig 9: Perfil de Carga
     hours = np.arange(HORIZON) * 15/60
@@ -297,7 +511,7 @@ def generate_final_report(zetas, zeta_history):
     
     ax1.set_title('Perfil de Carga: ADP vs EDLD')
     ax1.legend(loc='upper left')
-    plt.savefig('fig9_perfil_carga.png')
+    plt.savefig(os.path.join(output_dir, 'fig9_perfil_carga.png'))
     
     # Fig Dashboard (Resumo)
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10,5))
@@ -306,10 +520,106 @@ def generate_final_report(zetas, zeta_history):
     ax2.bar(['ADP','EDLD'], [adp['sl'], edld['sl']], color=['green','orange'])
     ax2.axhline(100, color='red', linestyle='--')
     ax2.set_title('Nível de Serviço (%)')
-    plt.savefig('fig_dashboard.png')
+    plt.savefig(os.path.join(output_dir, 'fig_dashboard.png'))
     
     print("\n=== PROCESSO FINALIZADO COM SUCESSO ===")
-    print("Gráficos salvos na pasta atual.")
+    print(f"Gráficos salvos em {os.path.abspath(output_dir)}.")
+
+def make_updater(zetas, iteration=0, step_k=1, accumulators=None):
+    """
+    ZetaUpdater com a regra de passo configurada, continuando a sequência ao
+    retomar. `accumulators` (de _load_training_state) retoma R, r dos modos
+    'rls' e 'batch'.
+    """
+    step = StepSize(STEP_RULE, ALPHA, STEP_MIN, n=iteration, k=step_k, **STEP_PARAMS)
+    updater = ZetaUpdater(zetas, UPDATE_MODE, ALPHA, RLS_FORGETTING, step=step)
+    if accumulators is not None and not updater.restore(accumulators):
+        print(f"Aviso: acumuladores do modo '{accumulators['mode']}' ignorados "
+              f"(UPDATE_MODE = '{UPDATE_MODE}').")
+    return updater
+
+
+def make_monitor(history):
+    """Monitor de convergência com a janela recomposta do histórico de zetas."""
+    monitor = ConvergenceMonitor(CONVERGENCE_WINDOW, CONVERGENCE_TOL, CONVERGENCE_RESIDUAL_TOL,
+                                 CONVERGENCE_MIN_ITER)
+    monitor.seed(history)
+    return monitor
+
+
+def train(current_zetas, iteration_count, zeta_history, max_iterations=None, time_budget=None,
+          step_k=1, accumulators=None, seed_index=None):
+    """
+    Laço de treino serial. Roda até a iteração `max_iterations`, até
+    `time_budget` segundos, até o Ctrl+C ou até o critério de convergência
+    (ver make_monitor), se for atingido. O estado é salvo ao sair. Retorna
+    (zetas, iteração, motivo), com motivo 'converged', 'limit' ou 'interrupted'.
+    `step_k`, `accumulators` e `seed_index` vêm do checkpoint ao retomar
+    (o treino serial não usa sementes, só repassa o índice do paralelo).
+    """
+    if METRICS_FILE:
+        METRICS.enable(METRICS_FILE)
+
+    # O layout dos carregadores não muda entre dias: um único modelo serve o treino todo.
+    decision_model = None
+    if PERSISTENT_MODEL and DECISION_METHOD == 'milp' and SOLVER_BACKEND == 'pyomo':
+        decision_model = DecisionModel(get_base_scenario()[1], TAU)
+    updater = make_updater(current_zetas, iteration_count, step_k, accumulators)
+    monitor = make_monitor(zeta_history)
+    cache = None
+    if DECISION_CACHE:
+        # O MILP ignora a ocupação atual dos carregadores: fica fora da chave.
+        cache = DecisionCache(CACHE_SIZE, CACHE_ENERGY_STEP, zeta_tol=CACHE_ZETA_TOL,
+                              tau=TAU, include_occupancy=False)
+
+    start = time.time()
+    reason = 'limit'
+    try:
+        while not ((max_iterations is not None and iteration_count >= max_iterations) or
+                   (time_budget is not None and time.time() - start >= time_budget)):
+            if monitor.converged:
+                reason = 'converged'
+                break
+            # 1. Roda o dia
+            with METRICS.phase('train.simulate'):
+                res = run_day('ADP', current_zetas, training=True,
+                              decision_model=decision_model, cache=cache)
+            iteration_count += 1
+            zeta_history.append(current_zetas.copy())
+            
+            # 2. Calcula V_hat
+            # 3. Regressão e Atualização
+            with METRICS.phase('train.update'):
+                v_hat = discounted_returns(res['step_costs'], GAMMA)
+                current_zetas = updater.update(current_zetas, res['feats'], v_hat)
+            monitor.update(current_zetas, updater.last_residual)
+            
+            # 4. Log e Salvamento
+            if iteration_count % CHECKPOINT_INTERVAL == 0:
+                with METRICS.phase('train.checkpoint'):
+                    save_checkpoint(current_zetas, iteration_count)
+                    save_training_state(current_zetas, iteration_count, zeta_history,
+                                        updater.step.k, seed_index, updater.state())
+                
+            METRICS.log_iteration(iteration_count, cost=round(res['cost'], 4),
+                                  cache_hit_rate=cache.hit_rate if cache else None,
+                                  alpha=updater.last_alpha, **monitor.status())
+            cache_info = f" | Cache={cache.hit_rate:.0%}" if cache else ""
+            print(f"Iter {iteration_count}: Custo={res['cost']:.2f} | Zeta_Carga={current_zetas[3]:.2f}{cache_info}")
+
+    except KeyboardInterrupt:
+        reason = 'interrupted'
+    METRICS.disable()
+
+    if reason == 'converged':
+        status = monitor.status()
+        print(f"\n>>> Convergência na iteração {iteration_count}: deriva={status['drift']:.2e} | "
+              f"variação do resíduo={status['residual_change']:.2%}")
+    if zeta_history:
+        save_checkpoint(current_zetas, iteration_count)
+        save_training_state(current_zetas, iteration_count, zeta_history, updater.step.k,
+                            seed_index, updater.state())
+    return current_zetas, iteration_count, reason
 
 # ==========================================
 # 5. LOOP PRINCIPAL COM MENU
@@ -319,8 +629,11 @@ def main():
     
     current_zetas = np.zeros(6)
     current_zetas[3] = 10.0 # Inicialização padrão
-    zeta_history = []
+    zeta_history = None
     iteration_count = 0
+    step_k = 1
+    accumulators = None
+    seed_index = None
     
     # Verificar Checkpoint
     checkpoint = load_checkpoint()
@@ -339,6 +652,9 @@ def main():
             current_zetas = checkpoint['zetas']
             iteration_count = checkpoint['iteration']
             zeta_history = checkpoint['history']
+            step_k = checkpoint.get('step_k', 1)
+            accumulators = checkpoint.get('accumulators')
+            seed_index = checkpoint.get('seed_index')
             print(f"\n>>> Retomando da iteração {iteration_count}...")
             
         elif choice == 'F':
@@ -354,49 +670,26 @@ def main():
     else:
         print("\nNenhum checkpoint encontrado. Iniciando novo treinamento.")
 
-    # LOOP INFINITO DE TREINO
+    if zeta_history is None:
+        zeta_history = open_history()
+        zeta_history.clear()
+
+    # LOOP DE TREINO (até o Ctrl+C ou o critério de convergência)
     print("\n>>> TREINAMENTO INICIADO (Pressione Ctrl+C para pausar/menu)")
     time.sleep(2) # Pausa dramática
-    
-    try:
-        while True:
-            iteration_count += 1
-            
-            # 1. Roda o dia
-            res = run_day('ADP', current_zetas, training=True)
-            zeta_history.append(current_zetas.copy())
-            
-            # 2. Calcula V_hat
-            v_hat = []
-            for t in range(HORIZON):
-                fut = 0
-                disc = 1.0
-                for k in range(t, HORIZON):
-                    fut += disc * res['step_costs'][k]
-                    disc *= GAMMA
-                v_hat.append(fut)
-            
-            # 3. Regressão e Atualização
-            reg = LinearRegression(fit_intercept=False)
-            reg.fit(res['feats'], v_hat)
-            current_zetas = (1 - ALPHA) * current_zetas + ALPHA * reg.coef_
-            
-            # 4. Log e Salvamento
-            if iteration_count % CHECKPOINT_INTERVAL == 0:
-                save_checkpoint(current_zetas, iteration_count)
-                save_training_state(current_zetas, iteration_count, zeta_history)
-                
-            print(f"Iter {iteration_count}: Custo={res['cost']:.2f} | Zeta_Carga={current_zetas[3]:.2f}")
 
-    except KeyboardInterrupt:
+    current_zetas, iteration_count, reason = train(current_zetas, iteration_count, zeta_history,
+                                                   step_k=step_k, accumulators=accumulators,
+                                                   seed_index=seed_index)
+    if reason == 'interrupted':
         print("\n\n>>> TREINAMENTO PAUSADO PELO USUÁRIO <<<")
-        print(f"Estado salvo na iteração {iteration_count}.")
-        
-        choice = input("\nDeseja [F]inalizar e gerar gráficos ou apenas [S]air? (F/S): ").upper()
-        if choice == 'F':
-            generate_final_report(current_zetas, zeta_history)
-        else:
-            print("Até logo! Pode retomar depois rodando o script novamente.")
+    print(f"Estado salvo na iteração {iteration_count}.")
+    
+    choice = input("\nDeseja [F]inalizar e gerar gráficos ou apenas [S]air? (F/S): ").upper()
+    if choice == 'F':
+        generate_final_report(current_zetas, zeta_history)
+    else:
+        print("Até logo! Pode retomar depois rodando o script novamente.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,187 @@
+import argparse
+import os
+import random
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+import main
+from main import (CHECKPOINT_INTERVAL, GAMMA, TAU, run_day,
+                  get_base_scenario, load_checkpoint, make_monitor, make_updater,
+                  open_history, save_checkpoint, save_training_state)
+from adp_update import discounted_returns
+from solver import DecisionModel
+from instrumentation import METRICS
+
+# ==========================================
+# TREINAMENTO PARALELO (MINI-BATCH ADP)
+# ==========================================
+# K dias de treino independentes rodam num pool de processos contra os zetas
+# atuais; as amostras (features, v_hat) de todos eles alimentam UMA regressão
+# por atualização, pelo mesmo ZetaUpdater (UPDATE_MODE) do main().
+# Cada atualização conta como uma iteração: uma linha no histórico de zetas
+# e checkpoints a cada CHECKPOINT_INTERVAL, como no treino serial.
+
+_decision_model = None  # Modelo persistente de cada processo trabalhador
+
+
+def _init_worker():
+    global _decision_model
+    # Ctrl+C é tratado só pelo processo principal.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if main.PERSISTENT_MODEL and main.DECISION_METHOD == 'milp' and main.SOLVER_BACKEND == 'pyomo':
+        _decision_model = DecisionModel(get_base_scenario()[1], TAU)
+    if main.METRICS_FILE:
+        # Só acumula; o processo principal soma os snapshots e grava o JSONL.
+        METRICS.enable()
+
+
+def day_seed(base_seed, task_index):
+    """Semente reprodutível do dia `task_index` (independe do trabalhador)."""
+    return int(np.random.SeedSequence([base_seed, task_index]).generate_state(1)[0])
+
+
+def _training_day(zetas, seed):
+    """Roda um dia de treino e devolve as amostras da regressão."""
+    random.seed(seed)
+    with METRICS.phase('train.simulate'):
+        res = run_day('ADP', zetas, training=True, decision_model=_decision_model)
+    snapshot = METRICS.snapshot() if METRICS.enabled else None
+    METRICS.reset()
+    return res['feats'], discounted_returns(res['step_costs'], GAMMA), res['cost'], snapshot
+
+
+def train_parallel(workers, batch_size=None, async_updates=False, seed=0,
+                   max_iterations=None, resume=True, time_budget=None):
+    """
+    Treina com `workers` processos. Cada atualização usa `batch_size` dias
+    (padrão: um por trabalhador). Com `async_updates`, a atualização ocorre
+    assim que `batch_size` dias terminam, e os trabalhadores livres recebem
+    novos dias com os zetas mais recentes, sem esperar os mais lentos.
+    Para na iteração `max_iterations` ou após `time_budget` segundos.
+    """
+    batch_size = batch_size or workers
+
+    current_zetas = np.zeros(6)
+    current_zetas[3] = 10.0 # Inicialização padrão
+    iteration_count = 0
+    step_k = 1
+    accumulators = None
+    task_index = 0
+
+    checkpoint = load_checkpoint() if resume else None
+    if checkpoint:
+        current_zetas = checkpoint['zetas']
+        iteration_count = checkpoint['iteration']
+        zeta_history = checkpoint['history']
+        step_k = checkpoint.get('step_k', 1)
+        accumulators = checkpoint.get('accumulators')
+        # Estados antigos não guardam o índice: supõe batch_size dias por iteração.
+        task_index = checkpoint.get('seed_index')
+        if task_index is None:
+            task_index = iteration_count * batch_size
+        print(f">>> Retomando da iteração {iteration_count}...")
+    else:
+        zeta_history = open_history()
+        zeta_history.clear()
+
+    updater = make_updater(current_zetas, iteration_count, step_k, accumulators)
+    monitor = make_monitor(zeta_history)
+
+    # A semente de cada dia depende só da ordem de submissão. O estado salvo
+    # guarda o próximo índice a submeter: no modo assíncrono uma atualização
+    # pode usar mais de batch_size dias, e os dias ainda pendentes na
+    # interrupção são descartados; nenhuma semente é repetida na retomada.
+    start = time.time()
+    start_iteration = iteration_count
+    if main.METRICS_FILE:
+        METRICS.enable(main.METRICS_FILE)
+
+    def record(zetas, samples):
+        """Aplica a atualização e mantém histórico/checkpoints como no main()."""
+        nonlocal iteration_count
+        iteration_count += 1
+        zeta_history.append(zetas.copy())
+        with METRICS.phase('train.update'):
+            feats = [f for s in samples for f in s[0]]
+            v_hat = np.concatenate([s[1] for s in samples])
+            zetas = updater.update(zetas, feats, v_hat)
+        monitor.update(zetas, updater.last_residual)
+        if iteration_count % CHECKPOINT_INTERVAL == 0:
+            with METRICS.phase('train.checkpoint'):
+                save_checkpoint(zetas, iteration_count)
+                save_training_state(zetas, iteration_count, zeta_history, updater.step.k, task_index,
+                                    updater.state())
+        for s in samples:
+            METRICS.merge(s[3])
+        METRICS.log_iteration(iteration_count, cost=round(float(np.mean([s[2] for s in samples])), 4),
+                              days=len(samples), alpha=updater.last_alpha, **monitor.status())
+        # Só as iterações desta sessão (não as retomadas do checkpoint)
+        rate = (iteration_count - start_iteration) / max(time.time() - start, 1e-9)
+        print(f"Iter {iteration_count}: Custo médio={np.mean([s[2] for s in samples]):.2f} | "
+              f"Zeta_Carga={zetas[3]:.2f} | {rate:.1f} it/s")
+        return zetas
+
+    def done():
+        return ((max_iterations is not None and iteration_count >= max_iterations) or
+                (time_budget is not None and time.time() - start >= time_budget) or
+                monitor.converged)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        try:
+            if not async_updates:
+                while not done():
+                    futures = [pool.submit(_training_day, current_zetas, day_seed(seed, task_index + k))
+                               for k in range(batch_size)]
+                    task_index += batch_size
+                    samples = [f.result() for f in futures]
+                    current_zetas = record(current_zetas, samples)
+            else:
+                pending = set()
+                for _ in range(workers):
+                    pending.add(pool.submit(_training_day, current_zetas, day_seed(seed, task_index)))
+                    task_index += 1
+                ready = []
+                while not done():
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in finished:
+                        ready.append(f.result())
+                        pending.add(pool.submit(_training_day, current_zetas, day_seed(seed, task_index)))
+                        task_index += 1
+                    if len(ready) >= batch_size:
+                        current_zetas = record(current_zetas, ready)
+                        ready = []
+                for f in pending:
+                    f.cancel()
+        except KeyboardInterrupt:
+            print("\n\n>>> TREINAMENTO PAUSADO PELO USUÁRIO <<<")
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    if monitor.converged:
+        print(f">>> Convergência na iteração {iteration_count}: {monitor.status()}")
+    if zeta_history:
+        save_checkpoint(current_zetas, iteration_count)
+        save_training_state(current_zetas, iteration_count, zeta_history, updater.step.k,
+                            task_index, updater.state())
+        print(f"Estado salvo na iteração {iteration_count}.")
+    METRICS.disable()
+
+    return current_zetas, zeta_history
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Treinamento ADP em paralelo")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--async-updates", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=None)
+    parser.add_argument("--time-budget", type=float, default=None, help="Segundos de treino")
+    parser.add_argument("--fresh", action="store_true", help="Ignora checkpoints existentes")
+    args = parser.parse_args()
+
+    train_parallel(args.workers, args.batch_size, args.async_updates, args.seed,
+                   args.iterations, resume=not args.fresh, time_budget=args.time_budget)
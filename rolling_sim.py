@@ -0,0 +1,507 @@
+import argparse
+import json
+import math
+import os
+import time
+from dataclasses import asdict
+
+import numpy as np
+
+import main
+from main import HORIZON, PENALTY, PRICES, TAU, _adp_decision, _drop_departed
+from classes import EV
+from features import FeatureExtractor, FeatureState
+from heuristics import HeuristicScheduler, solve_heuristic
+from history_store import ZetaHistoryStore
+from scenarios import SyntheticScenario, TraceScenario, iter_records, iter_trace, load_site
+
+# ==========================================
+# SIMULAÇÃO CONTÍNUA (HORIZONTE ROLANTE)
+# ==========================================
+# Um pátio simulado por semanas ou meses sem reiniciar à meia-noite: os VEs
+# ficam de um dia para o outro (partida sem corte em 96) e a curva de preço
+# continua no dia seguinte. As épocas de decisão são locais ao dia (0..95):
+# na virada, os VEs presentes são rebaseados em -96, de modo que a política
+# ADP vê as mesmas features do treino e a regra PRICE enxerga os preços de
+# hoje e de amanhã. Cada época vira uma linha num `sink` (buffer circular,
+# arquivo em disco ou callback) e os agregados ocupam memória constante.
+# Snapshots periódicos em JSON (atômicos) permitem retomar a execução.
+
+EPOCH_FIELDS = ('epoch', 'price', 'energy_kwh', 'cost', 'penalty', 'evs', 'connected', 'cpu_s')
+FEATURE_FIELDS = tuple(f'phi_{i}' for i in range(6))
+TOTAL_FIELDS = ('cost', 'energy', 'required', 'penalty', 'unmet_evs', 'arrived',
+                'decision_epochs', 'cpu', 'peak_kw')
+SNAPSHOT_FORMAT = 1
+OUTPUT_FILE = "epochs.npy"
+OUTPUT_PROGRESS = "epochs.progress"
+
+
+# ==========================================
+# SAÍDAS POR ÉPOCA (SINKS)
+# ==========================================
+# Interface: open(campos, início), write(linha), flush() e rows_written.
+# `início` é o número de linhas já entregues (retomada de um snapshot).
+
+class RingBufferSink:
+    """Últimas `capacity` linhas em memória (painéis, inspeção, testes)."""
+
+    def __init__(self, capacity=HORIZON * 7):
+        self.capacity = capacity
+        self.fields = None
+        self.rows_written = 0
+        self._first = 0
+        self._data = None
+
+    def open(self, fields, start=0):
+        self.fields = tuple(fields)
+        self._data = np.full((self.capacity, len(self.fields)), np.nan)
+        self.rows_written = self._first = start
+
+    def write(self, row):
+        self._data[self.rows_written % self.capacity] = row
+        self.rows_written += 1
+
+    def flush(self):
+        pass
+
+    def view(self):
+        """Linhas guardadas, da mais antiga para a mais recente."""
+        n = min(self.capacity, self.rows_written - self._first)
+        return self._data[np.arange(self.rows_written - n, self.rows_written) % self.capacity]
+
+
+class ArraySink:
+    """
+    Linhas num .npy em disco (memmap só-anexar do ZetaHistoryStore), gravadas
+    em blocos de `chunk`. Na retomada, linhas além do snapshot são descartadas.
+    """
+
+    def __init__(self, directory, chunk=HORIZON):
+        self.directory = directory
+        self.chunk = chunk
+        self.fields = None
+        self.store = None
+        self._buffer = []
+
+    @property
+    def rows_written(self):
+        return len(self.store) + len(self._buffer)
+
+    def open(self, fields, start=0):
+        self.fields = tuple(fields)
+        self.store = ZetaHistoryStore(self.directory, width=len(self.fields),
+                                      filename=OUTPUT_FILE, progress_file=OUTPUT_PROGRESS)
+        if self.store.width != len(self.fields):
+            raise ValueError(f"{self.store.path} tem {self.store.width} colunas, "
+                             f"esperadas {len(self.fields)}")
+        if len(self.store) < start:
+            print(f"Aviso: {self.store.path} tem {len(self.store)} linhas, snapshot espera {start}")
+        self.store.rows = min(len(self.store), start)
+        self._buffer = []
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "fields.json"), 'w') as f:
+            json.dump(list(self.fields), f)
+
+    def write(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.chunk:
+            self.store.extend(self._buffer)
+            self._buffer = []
+
+    def flush(self):
+        if self._buffer:
+            self.store.extend(self._buffer)
+            self._buffer = []
+        self.store.flush()
+
+    def view(self):
+        """Linhas já gravadas (memmap, sem cópia)."""
+        return self.store.view()
+
+
+class CallbackSink:
+    """Chama `fn({campo: valor})` a cada época."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.fields = None
+        self.rows_written = 0
+
+    def open(self, fields, start=0):
+        self.fields = tuple(fields)
+        self.rows_written = start
+
+    def write(self, row):
+        self.fn(dict(zip(self.fields, row)))
+        self.rows_written += 1
+
+    def flush(self):
+        pass
+
+
+# ==========================================
+# CHEGADAS EM TEMPO CONTÍNUO
+# ==========================================
+# Interface: arrivals(época absoluta) -> [EV, ...], state() e
+# restore(estado, época) para os snapshots.
+
+class StochasticArrivals:
+    """
+    Processo de chegadas do treino sem corte à meia-noite: uma chegada com
+    probabilidade `prob` por época, permanência `dwell`, demanda `energy`.
+    """
+
+    def __init__(self, seed=0, prob=0.15, dwell=35, energy=30.0, first_id=100):
+        self.rng = np.random.default_rng(seed)
+        self.prob = prob
+        self.dwell = dwell
+        self.energy = energy
+        self.next_id = first_id
+
+    def arrivals(self, epoch):
+        if self.rng.random() >= self.prob:
+            return []
+        ev = EV(self.next_id, epoch, epoch + self.dwell, self.energy, self.energy)
+        self.next_id += 1
+        return [ev]
+
+    def state(self):
+        return {'rng': self.rng.bit_generator.state, 'next_id': self.next_id}
+
+    def restore(self, state, epoch):
+        self.rng.bit_generator.state = state['rng']
+        self.next_id = state['next_id']
+
+
+class TraceArrivals:
+    """Chegadas de um fluxo de registros com épocas absolutas (trace ou SyntheticScenario.records)."""
+
+    def __init__(self, records):
+        self._scenario = TraceScenario([], records, horizon=math.inf)
+
+    def arrivals(self, epoch):
+        return self._scenario.arrivals(epoch)
+
+    def state(self):
+        return None
+
+    def restore(self, state, epoch):
+        # O fluxo é relido do início: basta pular as chegadas já simuladas.
+        self._scenario.skip_to(epoch)
+
+
+# ==========================================
+# SIMULADOR
+# ==========================================
+
+class RollingSimulator:
+    """
+    Simulação contínua de `strategy` ('ADP' ou regra do heuristics.py) num
+    pátio. `prices` é uma curva periódica (comprimento múltiplo de 96, ex.:
+    uma semana) ou uma função dia -> 96 preços; padrão PRICES todo dia.
+    `cache` aceita um DecisionCache ou uma DecisionTable, como no run_day.
+    """
+
+    def __init__(self, strategy, chargers, arrivals, zetas=None, evs=(), prices=None,
+                 sink=None, decision_model=None, cache=None, snapshot_path=None,
+                 snapshot_every=None):
+        prices = PRICES if prices is None else prices
+        if not callable(prices) and len(prices) % HORIZON:
+            raise ValueError(f"Curva de preço com {len(prices)} épocas (esperado múltiplo de {HORIZON})")
+        self.strategy = strategy
+        self.zetas = zetas
+        self.chargers = chargers
+        self.arrivals = arrivals
+        self.prices = prices
+        self.sink = sink
+        self.decision_model = decision_model
+        self.cache = cache
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+        self.fields = EPOCH_FIELDS + (FEATURE_FIELDS if strategy == 'ADP' else ())
+
+        self.epoch = 0
+        self.evs = list(evs)
+        self.totals = dict.fromkeys(TOTAL_FIELDS, 0.0)
+        self.totals['required'] = sum(e.required_energy for e in self.evs)
+
+        self._day_start = 0       # Época absoluta da época local 0 dos VEs em self.evs
+        self._sink_start = 0
+        self._started = False
+        self._chargers_by_id = {c.id: c for c in chargers}
+        self._extractor = FeatureExtractor(TAU)
+        self.fstate = None
+        self.scheduler = None
+        self.window = None
+
+    # --- Dia ---
+
+    def _day_prices(self, day):
+        if callable(self.prices):
+            return list(self.prices(day))
+        start = (day * HORIZON) % len(self.prices)
+        return list(self.prices[start:start + HORIZON])
+
+    def _begin_day(self):
+        """Preços de hoje e amanhã; agregados e fila refeitos nas épocas locais."""
+        day = self._day_start // HORIZON
+        self.window = self._day_prices(day) + self._day_prices(day + 1)
+        self.fstate = None
+        if main.INCREMENTAL_FEATURES:
+            self.fstate = FeatureState(self.chargers, TAU, verify=main.VERIFY_FEATURES)
+            for ev in self.evs: self.fstate.on_arrival(ev)
+        self.scheduler = None
+        if main.HEAP_SCHEDULER and self.strategy != 'ADP':
+            self.scheduler = HeuristicScheduler(self.chargers, self.strategy, TAU, self.window)
+            for ev in self.evs: self.scheduler.add(ev)
+
+    def _start(self):
+        if self.sink is not None:
+            self.sink.open(self.fields, self._sink_start)
+        self._begin_day()
+        self._started = True
+
+    # --- Época ---
+
+    def step(self):
+        t = self.epoch % HORIZON
+        day_start = self.epoch - t
+        if day_start != self._day_start:
+            shift = day_start - self._day_start
+            for ev in self.evs:
+                ev.arrival_time -= shift
+                ev.departure_time -= shift
+            self._day_start = day_start
+            self._begin_day()
+        price = self.window[t]
+        fstate, scheduler = self.fstate, self.scheduler
+
+        # Chegadas (épocas absolutas -> locais)
+        new_evs = self.arrivals.arrivals(self.epoch)
+        for ev in new_evs:
+            ev.arrival_time -= day_start
+            ev.departure_time -= day_start
+            if fstate is not None: fstate.on_arrival(ev)
+            if scheduler is not None: scheduler.add(ev)
+        self.evs.extend(new_evs)
+        self.totals['required'] += sum(e.required_energy for e in new_evs)
+        self.totals['arrived'] += len(new_evs)
+
+        phi = ()
+        if self.strategy == 'ADP':
+            if fstate is not None:
+                phi = fstate.phi(t, self.evs, self.chargers)
+            else:
+                phi = self._extractor.get_basis_functions(self.evs, self.chargers, t)
+
+        # Decisão (épocas ociosas não chamam solver/heurística, como no run_day)
+        decs = []
+        cpu = 0.0
+        if not main.EVENT_DRIVEN or any(e.current_energy_needed > 0.001 for e in self.evs):
+            start = time.time()
+            if self.strategy == 'ADP':
+                decs, _, _ = _adp_decision(self.evs, self.chargers, t, self.zetas, self.decision_model,
+                                           self.cache, fstate, price)
+            elif scheduler is not None:
+                decs = scheduler.decide(self.chargers, t)
+            else:
+                decs = solve_heuristic(self.evs, self.chargers, self.strategy, TAU, t, self.window)
+            cpu = time.time() - start
+            self.totals['decision_epochs'] += 1
+
+        # Física
+        for c in self.chargers: c.connected_evs = {}
+        if fstate is not None: fstate.reset_connections()
+        by_id = {ev.id: ev for ev in self.evs}
+        step_c = 0.0
+        step_e = 0.0
+        for d in decs:
+            charger = self._chargers_by_id[d['charger_id']]
+            charger.connected_evs[d['connector_id']] = d['ev_id']
+            ev = by_id[d['ev_id']]
+            energy = min(d['charge_rate']*(TAU/60.0), ev.current_energy_needed)
+            if fstate is not None:
+                fstate.on_connect(ev)
+                fstate.on_charge(ev, energy)
+            ev.current_energy_needed -= energy
+            if scheduler is not None: scheduler.update(ev)
+            ev.assigned_charger_id = d['charger_id']
+            step_c += energy * price
+            step_e += energy
+
+        # Penalidade
+        penalty = 0.0
+        for ev in self.evs:
+            if ev.departure_time == t and ev.current_energy_needed > 0.1:
+                penalty += ev.current_energy_needed * PENALTY
+                self.totals['unmet_evs'] += 1
+
+        present = len(self.evs)
+        self.evs = _drop_departed(self.evs, t, fstate, scheduler)
+
+        totals = self.totals
+        totals['cost'] += step_c + penalty
+        totals['penalty'] += penalty
+        totals['energy'] += step_e
+        totals['cpu'] += cpu
+        totals['peak_kw'] = max(totals['peak_kw'], step_e / (TAU/60.0))
+        if self.sink is not None:
+            self.sink.write([self.epoch, price, step_e, step_c + penalty, penalty, present,
+                             len(decs), cpu, *phi])
+
+        self.epoch += 1
+        if self.snapshot_path and self.snapshot_every and self.epoch % self.snapshot_every == 0:
+            self.save_snapshot()
+
+    def run(self, n_epochs):
+        """Simula mais `n_epochs` épocas e devolve o resumo acumulado."""
+        if not self._started:
+            self._start()
+        end = self.epoch + n_epochs
+        while self.epoch < end:
+            self.step()
+        if self.sink is not None:
+            self.sink.flush()
+        return self.summary()
+
+    def summary(self):
+        totals = self.totals
+        days = self.epoch / HORIZON
+        return {
+            'epochs': self.epoch,
+            'days': days,
+            'cost': totals['cost'],
+            'cost_per_day': totals['cost'] / days if days else 0.0,
+            'penalty': totals['penalty'],
+            'sl': totals['energy'] / totals['required'] * 100 if totals['required'] > 0 else 100,
+            'unmet_evs': int(totals['unmet_evs']),
+            'arrived': int(totals['arrived']),
+            'present_evs': len(self.evs),
+            'peak_kw': totals['peak_kw'],
+            'cpu': totals['cpu'] / self.epoch if self.epoch else 0.0,
+        }
+
+    # --- Snapshots ---
+
+    def save_snapshot(self, path=None):
+        """Grava o estado (VEs em épocas absolutas) de forma atômica."""
+        path = path or self.snapshot_path
+        if self.sink is not None:
+            self.sink.flush()
+        evs = []
+        for ev in self.evs:
+            d = asdict(ev)
+            d['arrival_time'] += self._day_start
+            d['departure_time'] += self._day_start
+            evs.append(d)
+        data = {
+            'format': SNAPSHOT_FORMAT,
+            'strategy': self.strategy,
+            'epoch': self.epoch,
+            'evs': evs,
+            'connections': {str(c.id): c.connected_evs for c in self.chargers},
+            'totals': self.totals,
+            'arrivals': self.arrivals.state(),
+            'sink_rows': self.sink.rows_written if self.sink is not None else 0,
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path=None):
+        """Retoma do snapshot (chamar antes do primeiro run)."""
+        path = path or self.snapshot_path
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError(f"Formato de snapshot desconhecido em {path}")
+        if data['strategy'] != self.strategy:
+            print(f"Aviso: snapshot de '{data['strategy']}' retomado com '{self.strategy}'")
+
+        self.epoch = data['epoch']
+        self._day_start = self.epoch - self.epoch % HORIZON
+        self.evs = []
+        for d in data['evs']:
+            ev = EV(**d)
+            ev.arrival_time -= self._day_start
+            ev.departure_time -= self._day_start
+            self.evs.append(ev)
+        for c in self.chargers:
+            c.connected_evs = {int(k): v for k, v in data['connections'].get(str(c.id), {}).items()}
+        self.totals.update(data['totals'])
+        self.arrivals.restore(data['arrivals'], self.epoch)
+        self._sink_start = data['sink_rows']
+        self._started = False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulação contínua de vários dias")
+    parser.add_argument("--days", type=float, default=30, help="Dias a simular (total, contando a retomada)")
+    parser.add_argument("--strategy", default="ADP", help="'ADP' ou regra (EDLD, FCLD, LLF, PRICE)")
+    parser.add_argument("--checkpoint", default=None, help="JSON com os zetas (padrão: último checkpoint)")
+    parser.add_argument("--site", default=None, help="JSON do pátio (padrão: pátio base)")
+    parser.add_argument("--trace", default=None, help="Trace .csv/.bin com épocas absolutas")
+    parser.add_argument("--evs-per-day", type=int, default=None, help="Chegadas sintéticas (Poisson)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--method", default=None)
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--table", default=None, help="Tabela compilada (decision_table.py)")
+    parser.add_argument("--output", default=None, help="Pasta do arquivo de saídas por época")
+    parser.add_argument("--snapshot", default="rolling_snapshot.json")
+    parser.add_argument("--snapshot-days", type=float, default=7)
+    parser.add_argument("--report-days", type=float, default=7)
+    parser.add_argument("--resume", action="store_true", help="Continua do --snapshot")
+    args = parser.parse_args()
+
+    if args.method:
+        main.DECISION_METHOD = args.method
+    if args.backend:
+        main.SOLVER_BACKEND = args.backend
+
+    evs, chargers = load_site(args.site) if args.site else main.get_base_scenario()
+    if args.trace:
+        arrivals = TraceArrivals(iter_trace(args.trace))
+    elif args.evs_per_day:
+        synthetic = SyntheticScenario(chargers, args.evs_per_day, seed=args.seed)
+        arrivals = TraceArrivals(iter_records(synthetic.records(math.ceil(args.days) + 1)))
+    else:
+        arrivals = StochasticArrivals(args.seed)
+
+    zetas, decision_model, cache = None, None, None
+    if args.strategy == 'ADP':
+        if args.checkpoint:
+            from evaluation import _load_zetas
+            zetas = _load_zetas(args.checkpoint)
+        else:
+            checkpoint = main.load_checkpoint()
+            if not checkpoint:
+                raise SystemExit(f"Erro: nenhum checkpoint em {main.CHECKPOINT_DIR}.")
+            zetas = checkpoint['zetas']
+        if args.table:
+            main.DECISION_TABLE = args.table
+            cache = main.load_decision_table()
+        if main.PERSISTENT_MODEL and main.DECISION_METHOD == 'milp' and main.SOLVER_BACKEND == 'pyomo':
+            from solver import DecisionModel
+            decision_model = DecisionModel(chargers, TAU)
+
+    sim = RollingSimulator(args.strategy, chargers, arrivals, zetas, evs,
+                           sink=ArraySink(args.output) if args.output else None,
+                           decision_model=decision_model, cache=cache, snapshot_path=args.snapshot,
+                           snapshot_every=max(1, int(args.snapshot_days * HORIZON)))
+    if args.resume:
+        sim.load_snapshot()
+        print(f">>> Retomando da época {sim.epoch} (dia {sim.epoch / HORIZON:.1f})...")
+
+    total = int(args.days * HORIZON)
+    chunk = max(1, int(args.report_days * HORIZON))
+    try:
+        while sim.epoch < total:
+            s = sim.run(min(chunk, total - sim.epoch))
+            print(f"Dia {s['days']:.1f}: Custo/dia={s['cost_per_day']:.2f} | NS={s['sl']:.1f}% | "
+                  f"Sem carga={s['unmet_evs']} | VEs no pátio={s['present_evs']} | Pico={s['peak_kw']:.0f} kW")
+    except KeyboardInterrupt:
+        print(f"\n>>> Interrompido; --resume continua do último snapshot ({args.snapshot}).")
+        raise SystemExit(1)
+    sim.save_snapshot()
+    print(json.dumps(sim.summary(), indent=2))
@@ -0,0 +1,308 @@
+import csv
+import json
+
+import numpy as np
+
+from classes import EV, Charger
+
+# ==========================================
+# CENÁRIOS: PÁTIOS E CHEGADAS EM FLUXO
+# ==========================================
+# Um cenário segue a interface que o run_day espera:
+#   initial() -> (evs, chargers) e arrivals(t) -> [EV, ...]
+# As chegadas vêm de um iterador de registros (id, chegada, partida, demanda,
+# demanda restante) ordenados pela época de chegada. Os arquivos de trace
+# (CSV ou binário) são lidos sob demanda: só os VEs da época corrente viram
+# objetos EV, e o run_day já descarta os que partiram. As épocas do trace
+# são absolutas (dia d ocupa [d*96, (d+1)*96)); day_scenarios() fatia o fluxo
+# em dias para replays de vários meses com memória limitada.
+
+EPOCHS_PER_DAY = 96
+
+# Registro binário: inteiros/floats de 64 bits, little-endian.
+TRACE_DTYPE = np.dtype([
+    ('id', '<i8'),
+    ('arrival', '<i8'),
+    ('departure', '<i8'),
+    ('required_energy', '<f8'),
+    ('current_energy_needed', '<f8'),
+])
+TRACE_CHUNK = 65536  # Registros lidos por vez do arquivo binário
+
+DAY_ID_STRIDE = 2**32  # IDs sintéticos: dia * DAY_ID_STRIDE + sequência
+
+CSV_FIELDS = ('id', 'arrival', 'departure', 'required_energy', 'current_energy_needed')
+
+
+# --- Definição do pátio ---
+
+def load_site(path):
+    """
+    Lê um JSON {"chargers": [...], "evs": [...]} com os campos de Charger/EV.
+    Retorna (evs iniciais, carregadores).
+    """
+    with open(path, 'r') as f:
+        site = json.load(f)
+    chargers = [Charger(c['id'], float(c['max_power']), int(c['num_connectors']),
+                        bool(c.get('is_level_3', False)))
+                for c in site['chargers']]
+    evs = [EV(e['id'], e['arrival_time'], e['departure_time'], e['required_energy'],
+              e.get('current_energy_needed', e['required_energy']))
+           for e in site.get('evs', [])]
+    return evs, chargers
+
+
+def save_site(path, chargers, evs=()):
+    site = {
+        'chargers': [{'id': c.id, 'max_power': c.max_power, 'num_connectors': c.num_connectors,
+                      'is_level_3': c.is_level_3} for c in chargers],
+        'evs': [{'id': e.id, 'arrival_time': e.arrival_time, 'departure_time': e.departure_time,
+                 'required_energy': e.required_energy,
+                 'current_energy_needed': e.current_energy_needed} for e in evs],
+    }
+    with open(path, 'w') as f:
+        json.dump(site, f, indent=2)
+
+
+def _fresh_chargers(chargers):
+    return [Charger(c.id, c.max_power, c.num_connectors, c.is_level_3) for c in chargers]
+
+
+def _fresh_evs(evs):
+    return [EV(e.id, e.arrival_time, e.departure_time, e.required_energy, e.current_energy_needed)
+            for e in evs]
+
+
+# --- Leitura de traces (geradores) ---
+
+def iter_csv_trace(path):
+    """Gera tuplas (id, chegada, partida, demanda, restante) de um CSV com cabeçalho."""
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            required = float(row['required_energy'])
+            needed = row.get('current_energy_needed')
+            yield (int(row['id']), int(row['arrival']), int(row['departure']),
+                   required, float(needed) if needed not in (None, '') else required)
+
+
+def iter_binary_trace(path, chunk=TRACE_CHUNK):
+    """Gera blocos de registros TRACE_DTYPE via memmap (sem ler o arquivo inteiro)."""
+    data = np.memmap(path, dtype=TRACE_DTYPE, mode='r')
+    for start in range(0, len(data), chunk):
+        yield np.array(data[start:start + chunk])
+    del data
+
+
+def iter_trace(path):
+    """Registros de um trace .csv ou binário (.bin/.trace), um por vez."""
+    if path.endswith('.csv'):
+        yield from iter_csv_trace(path)
+        return
+    yield from iter_records(iter_binary_trace(path))
+
+
+def _iter_block(block):
+    return zip(block['id'].tolist(), block['arrival'].tolist(), block['departure'].tolist(),
+               block['required_energy'].tolist(), block['current_energy_needed'].tolist())
+
+
+def iter_records(blocks):
+    """Achata um iterável de blocos TRACE_DTYPE em tuplas de registro."""
+    for block in blocks:
+        yield from _iter_block(block)
+
+
+def write_binary_trace(path, records, chunk=TRACE_CHUNK):
+    """Grava registros (iterável de tuplas ou blocos TRACE_DTYPE) em disco, em blocos."""
+    count = 0
+    buffer = []
+    with open(path, 'wb') as f:
+        def flush():
+            nonlocal count
+            if buffer:
+                np.array(buffer, dtype=TRACE_DTYPE).tofile(f)
+                count += len(buffer)
+                buffer.clear()
+
+        for rec in records:
+            if isinstance(rec, np.ndarray):
+                flush()
+                rec.astype(TRACE_DTYPE, copy=False).tofile(f)
+                count += len(rec)
+                continue
+            buffer.append(tuple(rec))
+            if len(buffer) >= chunk:
+                flush()
+        flush()
+    return count
+
+
+def csv_to_binary(csv_path, bin_path):
+    return write_binary_trace(bin_path, iter_csv_trace(csv_path))
+
+
+# --- Cenários ---
+
+class TraceScenario:
+    """
+    Cenário de um dia alimentado por um iterador de registros ordenados por
+    chegada. `offset` é a época absoluta do início do dia; chegadas fora de
+    [offset, offset + horizon) não pertencem a este dia.
+    """
+
+    def __init__(self, chargers, records, initial_evs=(), offset=0, horizon=EPOCHS_PER_DAY):
+        self.chargers = chargers
+        self.initial_evs = list(initial_evs)
+        self.offset = offset
+        self.horizon = horizon
+        self._records = iter(records)
+        self._pending = None
+        self._last_arrival = None
+
+    def initial(self):
+        return _fresh_evs(self.initial_evs), _fresh_chargers(self.chargers)
+
+    def _peek(self):
+        if self._pending is None:
+            self._pending = next(self._records, None)
+            if self._pending is not None:
+                arrival = self._pending[1]
+                if self._last_arrival is not None and arrival < self._last_arrival:
+                    raise ValueError(f"Trace fora de ordem: chegada {arrival} após {self._last_arrival}")
+                self._last_arrival = arrival
+        return self._pending
+
+    def skip_to(self, epoch):
+        """Descarta, sem criar EVs, os registros com chegada anterior a `epoch` (absoluta)."""
+        rec = self._peek()
+        while rec is not None and rec[1] < epoch:
+            self._pending = None
+            rec = self._peek()
+
+    def exhausted(self):
+        return self._peek() is None
+
+    def arrivals(self, t):
+        """VEs que chegam na época local t (partida limitada ao fim do dia)."""
+        now = self.offset + t
+        new_evs = []
+        rec = self._peek()
+        while rec is not None and rec[1] <= now:
+            ev_id, arrival, departure, required, needed = rec
+            self._pending = None
+            if arrival == now:
+                new_evs.append(EV(ev_id, t, min(self.horizon, departure - self.offset),
+                                  float(required), float(needed)))
+            rec = self._peek()
+        return new_evs
+
+
+def trace_scenario(site_path, trace_path, day=0):
+    """Cenário do dia `day` de um trace (lê o arquivo até o início desse dia)."""
+    evs, chargers = load_site(site_path)
+    scenario = TraceScenario(chargers, iter_trace(trace_path), evs, offset=day * EPOCHS_PER_DAY)
+    scenario.skip_to(scenario.offset)
+    return scenario
+
+
+def day_scenarios(chargers, records, n_days=None, horizon=EPOCHS_PER_DAY):
+    """
+    Fatia um único fluxo de registros em dias consecutivos. Devolve sempre o
+    mesmo cenário, reposicionado; cada dia deve ser consumido (por um run_day)
+    antes de pedir o próximo.
+    """
+    scenario = TraceScenario(chargers, records, horizon=horizon)
+    day = 0
+    while (n_days is None or day < n_days) and not scenario.exhausted():
+        scenario.offset = day * horizon
+        scenario.skip_to(scenario.offset)
+        yield scenario
+        day += 1
+
+
+class SyntheticScenario:
+    """
+    Dia sintético de alta carga gerado de uma vez com NumPy: contagens de
+    Poisson por época, permanência e demanda sorteadas em vetores. Os objetos
+    EV só são criados na época de chegada.
+    """
+
+    def __init__(self, chargers, evs_per_day=1000, dwell=(8, 41), energy=(10.0, 60.0),
+                 profile=None, seed=0, horizon=EPOCHS_PER_DAY, first_id=1):
+        self.chargers = chargers
+        self.evs_per_day = evs_per_day
+        self.dwell = dwell
+        self.energy = energy
+        self.profile = profile   # Peso relativo de chegadas por época (None = uniforme)
+        self.seed = seed
+        self.horizon = horizon
+        self.first_id = first_id
+        self.day = 0             # Próximo dia gerado por initial()
+
+    def arrays(self, day=0):
+        """Registros TRACE_DTYPE do dia `day` (épocas absolutas), ordenados por chegada."""
+        rng = np.random.default_rng([self.seed, day])
+        weights = np.ones(self.horizon) if self.profile is None else np.asarray(self.profile, float)
+        rates = self.evs_per_day * weights / weights.sum()
+        counts = rng.poisson(rates)
+        n = int(counts.sum())
+
+        rec = np.empty(n, dtype=TRACE_DTYPE)
+        arrival = np.repeat(np.arange(self.horizon), counts)
+        rec['arrival'] = arrival + day * self.horizon
+        rec['departure'] = rec['arrival'] + rng.integers(self.dwell[0], self.dwell[1], n)
+        rec['required_energy'] = rng.uniform(self.energy[0], self.energy[1], n)
+        rec['current_energy_needed'] = rec['required_energy']
+        rec['id'] = self.first_id + day * DAY_ID_STRIDE + np.arange(n)
+        return rec
+
+    def records(self, n_days, start_day=0):
+        """Gerador de blocos diários (para write_binary_trace ou day_scenarios)."""
+        for day in range(start_day, start_day + n_days):
+            yield self.arrays(day)
+
+    def initial(self, day=None):
+        """Inicia o dia `day` (padrão: o próximo); chamadas sucessivas avançam o dia."""
+        if day is not None:
+            self.day = day
+        block = self.arrays(self.day)
+        self._scenario = TraceScenario(self.chargers, _iter_block(block),
+                                       offset=self.day * self.horizon, horizon=self.horizon)
+        self.day += 1
+        return self._scenario.initial()
+
+    def arrivals(self, t):
+        return self._scenario.arrivals(t)
+
+
+class StochasticDayScenario:
+    """
+    Dia estocástico com o mesmo processo de chegadas do treino (uma chegada
+    com probabilidade `prob` por época, permanência `dwell`, demanda
+    `energy`), mas com gerador próprio semeado e IDs únicos. Mesma semente,
+    mesmo fluxo de chegadas: é o que dá números aleatórios comuns entre
+    políticas. `base` devolve o pátio inicial (evs, chargers).
+    """
+
+    def __init__(self, base, seed, prob=0.15, dwell=35, energy=30.0, horizon=EPOCHS_PER_DAY):
+        self.base = base
+        self.seed = seed
+        self.prob = prob
+        self.dwell = dwell
+        self.energy = energy
+        self.horizon = horizon
+
+    def initial(self):
+        # Um sorteio por época, feito de uma vez: o fluxo não depende da política.
+        rng = np.random.default_rng(self.seed)
+        self._draws = rng.random(self.horizon) < self.prob
+        evs, chargers = self.base()
+        self._next_id = max((e.id for e in evs), default=0) + 100
+        return evs, chargers
+
+    def arrivals(self, t):
+        if not self._draws[t]:
+            return []
+        ev = EV(self._next_id, t, min(self.horizon, t + self.dwell), self.energy, self.energy)
+        self._next_id += 1
+        return [ev]
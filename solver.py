@@ -1,6 +1,209 @@
-import pyomo.environ as pyo
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+
+import numpy as np
+
+from assignment import constant_terms, ev_terms, evaluate_decisions, prune_dominated, solve_assignment
+from heuristics import solve_heuristic
+from instrumentation import METRICS
+
+# Pyomo e o backend SciPy são importados só por quem os usa: heurísticas e o
+# método 'fast' não pagam o custo de importação.
+
+METHODS = ('milp', 'reduced', 'fast', 'check')
+PROVENANCE = ('optimal', 'incumbent', 'fallback')
+# 'pyomo': modelo Pyomo resolvido pelo glpsol (arquivo LP + subprocesso);
+# 'highs': matriz esparsa resolvida em processo por scipy.optimize.milp.
+BACKENDS = ('pyomo', 'highs')
+
+# Nomes das opções (limite de tempo, gap relativo) em cada solver
+SOLVER_OPTIONS = {
+    'glpk': ('tmlim', 'mipgap'),
+    'cbc': ('sec', 'ratio'),
+    'cplex': ('timelimit', 'mipgap'),
+    'gurobi': ('TimeLimit', 'MIPGap'),
+    'highs': ('time_limit', 'mip_rel_gap'),
+    'appsi_highs': ('time_limit', 'mip_rel_gap'),
+}
+
+_watchdog = None    # Thread dos solves com prazo
+_late_solve = None  # Solve que estourou o prazo e ainda pode estar rodando
+
+
+class SolveError(RuntimeError):
+    """O solver terminou sem solução utilizável (inviável, abortado, sem incumbente)."""
+
+
+def _run_solver(solver, model, time_limit=None, mip_gap=None, **kwargs):
+    """
+    Resolve `model` conferindo o status. Retorna 'optimal' ou 'incumbent'
+    (melhor solução viável quando o tempo ou o gap cortaram a busca).
+    """
+    from pyomo.opt import TerminationCondition
+
+    time_opt, gap_opt = SOLVER_OPTIONS.get(getattr(solver, 'name', None), ('time_limit', 'mip_gap'))
+    for name, value in ((time_opt, time_limit), (gap_opt, mip_gap)):
+        if value is None:
+            solver.options.pop(name, None)
+        elif name == 'tmlim':
+            solver.options[name] = max(1, math.ceil(value))   # GLPK só aceita segundos inteiros
+        else:
+            solver.options[name] = value
+
+    results = solver.solve(model, load_solutions=False, **kwargs)
+    condition = results.solver.termination_condition
+    if condition in (TerminationCondition.optimal, TerminationCondition.globallyOptimal,
+                     TerminationCondition.locallyOptimal):
+        status = 'optimal'
+    elif len(results.solution) > 0 and condition not in (TerminationCondition.infeasible,
+                                                         TerminationCondition.unbounded,
+                                                         TerminationCondition.error):
+        status = 'incumbent'
+    else:
+        raise SolveError(f"Solver terminou sem solução ({condition})")
+    model.solutions.load_from(results)
+    return status
+
+
+def _remaining(time_limit, start):
+    """Tempo que sobra para o solver depois da montagem do modelo."""
+    if time_limit is None:
+        return None
+    left = time_limit - (time.perf_counter() - start)
+    if left <= 0:
+        raise SolveError("Prazo esgotado antes de chamar o solver")
+    return left
+
+
+def solve_decision_model(evs, chargers, current_epoch, energy_price, zetas, tau=15,
+                         method='milp', grid_limit=None, time_limit=None, mip_gap=None,
+                         return_status=False, backend='pyomo', constants=None):
+    """
+    Resolve a decisão de uma época. `method` escolhe a formulação:
+      - 'milp':    modelo completo, um binário por (carregador, conector, VE);
+      - 'reduced': contagens por carregador, sem simetria entre conectores;
+      - 'fast':    atribuição exata (método húngaro), sem Pyomo/GLPK;
+      - 'check':   'fast' conferido contra o MILP completo.
+    Todas retornam (decisões, valor do objetivo) no mesmo formato.
+    `grid_limit` (kW) é a restrição Grid_Capacity_Limit do adp_model.mod;
+    só os métodos 'milp' e 'reduced' a suportam. `time_limit` (s) e
+    `mip_gap` são repassados ao solver; com `return_status` o retorno ganha
+    a origem da solução ('optimal' ou 'incumbent'). Sem solução utilizável,
+    levanta SolveError. `backend` (ver BACKENDS) escolhe quem resolve os
+    métodos 'milp', 'reduced' e a referência do 'check'. `constants`
+    (FeatureState.solver_constants) evita recalcular os agregados da parte
+    constante do objetivo a partir da lista de VEs.
+    """
+    METRICS.count('solver.calls')
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {backend}")
+    if backend == 'highs' and method in ('milp', 'reduced'):
+        result = _solve_sparse_model(evs, chargers, current_epoch, energy_price, zetas, tau,
+                                     'full' if method == 'milp' else 'reduced',
+                                     grid_limit, time_limit, mip_gap, constants)
+    elif method == 'milp':
+        result = _solve_full_model(evs, chargers, current_epoch, energy_price, zetas, tau,
+                                   grid_limit, time_limit, mip_gap, constants)
+    elif method == 'reduced':
+        result = _solve_reduced_model(evs, chargers, current_epoch, energy_price, zetas, tau,
+                                      grid_limit, time_limit, mip_gap, constants)
+    elif grid_limit is not None:
+        raise ValueError(f"Método '{method}' não suporta grid_limit")
+    elif method == 'fast':
+        with METRICS.phase('solver.assignment'):
+            result = solve_assignment(evs, chargers, current_epoch, energy_price, zetas, tau,
+                                      constants) + ('optimal',)
+    elif method == 'check':
+        decisions, obj = solve_assignment(evs, chargers, current_epoch, energy_price, zetas, tau,
+                                          constants)
+        if backend == 'highs':
+            _, ref_obj, _ = _solve_sparse_model(evs, chargers, current_epoch, energy_price, zetas, tau,
+                                                constants=constants)
+        else:
+            _, ref_obj, _ = _solve_full_model(evs, chargers, current_epoch, energy_price, zetas, tau,
+                                              constants=constants)
+        if abs(obj - ref_obj) > 1e-6 * max(1.0, abs(ref_obj)):
+            print(f"Aviso: solver rápido diverge do MILP na época {current_epoch} "
+                  f"(obj {obj:.6f} vs {ref_obj:.6f})")
+        result = (decisions, obj, 'optimal')
+    else:
+        raise ValueError(f"Método de decisão desconhecido: {method}")
+    return result if return_status else result[:2]
+
+
+def _watchdog_pool():
+    """Uma única thread para os solves com prazo (ver solve_with_deadline)."""
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = ThreadPoolExecutor(max_workers=1, thread_name_prefix='solver-deadline')
+    return _watchdog
+
+
+def solve_with_deadline(evs, chargers, current_epoch, energy_price, zetas, tau=15,
+                        method='milp', deadline=None, mip_gap=None, fallback='EDLD',
+                        decision_model=None, backend='pyomo', fallback_on_error=False,
+                        constants=None):
+    """
+    Decisão com latência limitada. `deadline` (s) vale para a época inteira
+    (montagem + solver). Retorna (decisões, objetivo, origem), com origem
+    'optimal', 'incumbent' (melhor solução quando o tempo acabou) ou
+    'fallback' (regra `fallback` do solve_heuristic, se não houve solução).
+
+    Com prazo, o solve roda numa thread à parte: se a montagem do modelo ou
+    a interface com o solver estourarem o prazo, a resposta é o fallback e o
+    solve atrasado é descartado. Enquanto ele não termina, as épocas
+    seguintes também caem no fallback em vez de se acumularem.
+
+    Só SolveError e prazo esgotado levam ao fallback. Outras falhas (solver
+    ausente, erro do processo externo) são relançadas, a menos que
+    `fallback_on_error` peça o fallback também nesses casos.
+    """
+    start = time.perf_counter()
+    if decision_model is not None:
+        solve = lambda limit: decision_model.solve(evs, current_epoch, energy_price, zetas,
+                                                   time_limit=limit, mip_gap=mip_gap,
+                                                   return_status=True, constants=constants)
+    else:
+        solve = lambda limit: solve_decision_model(evs, chargers, current_epoch, energy_price,
+                                                   zetas, tau, method=method, time_limit=limit,
+                                                   mip_gap=mip_gap, return_status=True,
+                                                   backend=backend, constants=constants)
+    global _late_solve
+    try:
+        if deadline is None:
+            if _late_solve is not None:
+                # Pyomo não tolera dois solves simultâneos: espera o atrasado.
+                wait([_late_solve])
+                _late_solve = None
+            return solve(None)
+        future = _watchdog_pool().submit(solve, deadline)
+        try:
+            return future.result(timeout=max(0.0, deadline - (time.perf_counter() - start)))
+        except FutureTimeout:
+            if not future.cancel():
+                _late_solve = future
+            METRICS.count('solver.deadline_missed')
+    except SolveError:
+        pass
+    except Exception as exc:   # Solver ausente, falha do processo externo, etc.
+        if not fallback_on_error:
+            raise
+        print(f"Aviso: falha no solver na época {current_epoch} ({type(exc).__name__}: {exc}); "
+              f"usando {fallback}")
+
+    decisions = solve_heuristic(evs, chargers, fallback, tau)
+    obj = evaluate_decisions(decisions, evs, chargers, current_epoch, energy_price, zetas, tau)
+    return decisions, obj, 'fallback'
+
+
+def _solve_full_model(evs, chargers, current_epoch, energy_price, zetas, tau=15, grid_limit=None,
+                      time_limit=None, mip_gap=None, constants=None):
+    import pyomo.environ as pyo
+
+    start = time.perf_counter()
+    t0 = METRICS.clock()
 
-def solve_decision_model(evs, chargers, current_epoch, energy_price, zetas, tau=15):
     # 1. Prepara atribuições possíveis
     possible_assignments = []
     for charger in chargers:
@@ -11,7 +214,7 @@ def solve_decision_model(evs, chargers, current_epoch, energy_price, zetas, tau=
 
     # Proteção contra lista vazia
     if not possible_assignments:
-        return [], 0.0
+        return [], 0.0, 'optimal'
 
     model = pyo.ConcreteModel()
     model.A = pyo.Set(initialize=possible_assignments, dimen=3)
@@ -47,6 +250,10 @@ def solve_decision_model(evs, chargers, current_epoch, energy_price, zetas, tau=
         return model.q[i,k,j] * (tau/60.0) <= ev.current_energy_needed
     model.c4 = pyo.Constraint(model.A, rule=rule_demand)
 
+    # C5: Limite da rede (opcional)
+    if grid_limit is not None:
+        model.c5 = pyo.Constraint(expr=sum(model.q[idx] for idx in model.A) <= grid_limit)
+
     # --- Função Objetivo (ADP) ---
     
     # Custo Imediato
@@ -55,10 +262,13 @@ def solve_decision_model(evs, chargers, current_epoch, energy_price, zetas, tau=
     # Features reconstruídas com variáveis
     f_sched = sum(model.x[idx] for idx in model.A)
     
-    total_conn = sum(c.num_connectors for c in chargers)
+    if constants is not None:
+        total_conn, total_dem = constants['n_slots'], constants['total_need']
+    else:
+        total_conn = sum(c.num_connectors for c in chargers)
+        total_dem = sum(ev.current_energy_needed for ev in evs)
     f_avail = total_conn - f_sched
     
-    total_dem = sum(ev.current_energy_needed for ev in evs)
     energy_delivered_now = sum(model.q[idx] * (tau/60.0) for idx in model.A)
     f_rem = total_dem - energy_delivered_now
     
@@ -82,11 +292,16 @@ def solve_decision_model(evs, chargers, current_epoch, energy_price, zetas, tau=
            zetas[5]*f_time)
 
     model.obj = pyo.Objective(expr=cost_now + vfa, sense=pyo.minimize)
+    METRICS.stop('solver.build', t0)
+    METRICS.count('solver.variables', 2 * len(model.A))
+    METRICS.count('solver.constraints', len(model.c1) + len(model.c2) + len(model.c3) + len(model.c4))
 
     # Solver
     solver = pyo.SolverFactory('glpk')
-    solver.solve(model)
+    with METRICS.phase('solver.glpk'):
+        status = _run_solver(solver, model, _remaining(time_limit, start), mip_gap)
 
+    t0 = METRICS.clock()
     decisions = []
     for (i, k, j) in model.A:
         if pyo.value(model.x[i,k,j]) > 0.5:
@@ -94,5 +309,315 @@ def solve_decision_model(evs, chargers, current_epoch, energy_price, zetas, tau=
                 'charger_id': i, 'connector_id': k, 'ev_id': j,
                 'charge_rate': pyo.value(model.q[i,k,j])
             })
+    METRICS.stop('solver.extract', t0)
             
-    return decisions, pyo.value(model.obj)
\ No newline at end of file
+    return decisions, pyo.value(model.obj), status
+
+
+def _solve_reduced_model(evs, chargers, current_epoch, energy_price, zetas, tau=15,
+                         grid_limit=None, time_limit=None, mip_gap=None, constants=None):
+    """
+    Formulação agregada: y[i,j] indica que o VE j usa *algum* conector do
+    carregador i; o conector físico é numerado depois. Mesmo objetivo e
+    mesmas decisões (a menos da permutação de conectores) do modelo completo.
+    """
+    import pyomo.environ as pyo
+
+    start = time.perf_counter()
+    t0 = METRICS.clock()
+    h = tau / 60.0
+    need, urg, cands = ev_terms(evs, current_epoch)
+    n_slots = sum(c.num_connectors for c in chargers)
+    if not cands or n_slots == 0:
+        return [], 0.0, 'optimal'
+
+    cands = prune_dominated(cands, need, urg, n_slots, energy_price, zetas)
+
+    # Mapas de índices pré-calculados
+    by_charger = {c.id: [(c.id, j) for j in cands] for c in chargers if c.num_connectors > 0}
+    by_ev = {j: [(i, j) for i in by_charger] for j in cands}
+    pairs = [p for i_pairs in by_charger.values() for p in i_pairs]
+    capacity = {c.id: c.num_connectors for c in chargers}
+    max_power = {c.id: c.max_power for c in chargers}
+
+    model = pyo.ConcreteModel()
+    model.P = pyo.Set(initialize=pairs, dimen=2)
+    model.y = pyo.Var(model.P, domain=pyo.Binary)
+    model.q = pyo.Var(model.P, domain=pyo.NonNegativeReals)
+
+    # C1': No máximo `num_connectors` VEs por carregador
+    model.c1 = pyo.Constraint(list(by_charger), rule=lambda m, i:
+                              sum(m.y[p] for p in by_charger[i]) <= capacity[i])
+    # C2: Um carregador por EV
+    model.c2 = pyo.Constraint(cands, rule=lambda m, j:
+                              sum(m.y[p] for p in by_ev[j]) <= 1)
+    # C3: Potência Máxima
+    model.c3 = pyo.Constraint(model.P, rule=lambda m, i, j:
+                              m.q[i, j] <= max_power[i] * m.y[i, j])
+    # C4: Demanda Restante
+    model.c4 = pyo.Constraint(model.P, rule=lambda m, i, j:
+                              m.q[i, j] * h <= need[j])
+    # C5: Limite da rede (opcional)
+    if grid_limit is not None:
+        model.c5 = pyo.Constraint(expr=sum(model.q[p] for p in pairs) <= grid_limit)
+
+    # Mesmo objetivo do modelo completo
+    delivered = sum(model.q[p] * h for p in pairs)
+    f_sched = sum(model.y[p] for p in pairs)
+    _, total_dem, total_urg, f_time = constant_terms(evs, urg, chargers, current_epoch, tau, constants)
+    f_urg = total_urg - sum(urg[j] * model.y[i, j] for i, j in pairs)
+    vfa = (zetas[0] +
+           zetas[1]*f_sched +
+           zetas[2]*(n_slots - f_sched) +
+           zetas[3]*(total_dem - delivered) +
+           zetas[4]*f_urg +
+           zetas[5]*f_time)
+    model.obj = pyo.Objective(expr=energy_price * delivered + vfa, sense=pyo.minimize)
+    METRICS.stop('solver.build', t0)
+    METRICS.count('solver.variables', 2 * len(pairs))
+    METRICS.count('solver.constraints', len(model.c1) + len(model.c2) + len(model.c3) + len(model.c4))
+
+    with METRICS.phase('solver.glpk'):
+        status = _run_solver(pyo.SolverFactory('glpk'), model, _remaining(time_limit, start), mip_gap)
+
+    # Numera os conectores físicos na ordem dos VEs
+    t0 = METRICS.clock()
+    decisions = []
+    for i, i_pairs in by_charger.items():
+        k = 0
+        for p in i_pairs:
+            if pyo.value(model.y[p]) > 0.5:
+                decisions.append({
+                    'charger_id': i, 'connector_id': k, 'ev_id': p[1],
+                    'charge_rate': pyo.value(model.q[p])
+                })
+                k += 1
+    METRICS.stop('solver.extract', t0)
+
+    return decisions, pyo.value(model.obj), status
+
+
+def _solve_sparse_model(evs, chargers, current_epoch, energy_price, zetas, tau=15,
+                        formulation='full', grid_limit=None, time_limit=None, mip_gap=None,
+                        constants=None):
+    """Backend 'highs': mesmo modelo, montado em arrays e resolvido em processo."""
+    from scipy.optimize import Bounds, LinearConstraint, milp
+    from sparse_milp import SparseDecisionModel
+
+    start = time.perf_counter()
+    with METRICS.phase('solver.build'):
+        model = SparseDecisionModel(evs, chargers, current_epoch, energy_price, zetas, tau,
+                                    formulation, grid_limit, constants)
+    if model.n_pairs == 0:
+        return [], 0.0, 'optimal'
+    METRICS.count('solver.variables', 2 * model.n_pairs)
+    METRICS.count('solver.constraints', model.A.shape[0])
+
+    options = {}
+    if time_limit is not None:
+        options['time_limit'] = _remaining(time_limit, start)
+    if mip_gap is not None:
+        options['mip_rel_gap'] = mip_gap
+    with METRICS.phase('solver.highs'):
+        result = milp(model.c, integrality=model.integrality, bounds=Bounds(model.lb, model.ub),
+                      constraints=LinearConstraint(model.A, -np.inf, model.row_ub), options=options)
+
+    if result.status == 0:
+        status = 'optimal'
+    elif result.x is not None:
+        status = 'incumbent'
+    else:
+        raise SolveError(f"HiGHS terminou sem solução ({result.message})")
+
+    with METRICS.phase('solver.extract'):
+        decisions = model.decode(result.x)
+    return decisions, model.objective(result.x), status
+
+
+class DecisionModel:
+    """
+    Modelo de decisão persistente: construído uma vez e atualizado a cada
+    época, em vez de recriar o ConcreteModel a cada chamada.
+
+    Chegadas/saídas de VEs adicionam ou removem apenas as variáveis e
+    restrições afetadas; preço, demanda restante, urgência, tempo e zetas
+    são parâmetros mutáveis. A disposição dos carregadores é fixa, então a
+    mesma instância pode atravessar vários dias de treino.
+    """
+
+    def __init__(self, chargers, tau=15, solver_name='glpk'):
+        import pyomo.environ as pyo
+
+        self.tau = tau
+        self.connectors = [(c.id, k) for c in chargers for k in range(c.num_connectors)]
+        self.max_power = {c.id: c.max_power for c in chargers}
+        self.candidates = []   # IDs de VEs com variáveis no modelo (em ordem)
+
+        model = pyo.ConcreteModel()
+        model.A = pyo.Set(dimen=3, ordered=True, initialize=[])
+        model.J = pyo.Set(ordered=True, initialize=[])
+
+        model.x = pyo.Var(model.A, domain=pyo.Binary, dense=False)
+        model.q = pyo.Var(model.A, domain=pyo.NonNegativeReals, dense=False)
+
+        model.price = pyo.Param(mutable=True, initialize=0.0)
+        model.zeta = pyo.Param(range(6), mutable=True, initialize=0.0)
+        model.need = pyo.Param(model.J, mutable=True, default=0.0)
+        model.urg = pyo.Param(model.J, mutable=True, default=0.0)
+        model.total_dem = pyo.Param(mutable=True, initialize=0.0)
+        model.urg_rest = pyo.Param(mutable=True, initialize=0.0)  # VEs sem variáveis
+        model.f_time = pyo.Param(mutable=True, initialize=0.0)
+
+        model.c1 = pyo.Constraint(self.connectors)
+        model.c2 = pyo.Constraint(pyo.Any)
+        model.c3 = pyo.Constraint(pyo.Any)
+        model.c4 = pyo.Constraint(pyo.Any)
+        model.obj = pyo.Objective(expr=0.0, sense=pyo.minimize)
+
+        self.model = model
+        self.solver = pyo.SolverFactory(solver_name)
+        self.warm_start = self.solver.warm_start_capable()
+
+    # --- Estrutura ---
+
+    def _add_ev(self, j):
+        model = self.model
+        model.J.add(j)
+        for i, k in self.connectors:
+            idx = (i, k, j)
+            model.A.add(idx)
+            # Valor inicial viável (desconectado) para o warm start.
+            model.x[idx].value = 0
+            model.q[idx].value = 0.0
+            model.c3[idx] = model.q[idx] <= self.max_power[i] * model.x[idx]
+            model.c4[idx] = model.q[idx] * (self.tau/60.0) <= model.need[j]
+        model.c2[j] = sum(model.x[i, k, j] for i, k in self.connectors) <= 1
+
+    def _remove_ev(self, j):
+        model = self.model
+        del model.c2[j]
+        for i, k in self.connectors:
+            idx = (i, k, j)
+            del model.c3[idx]
+            del model.c4[idx]
+            del model.x[idx]
+            del model.q[idx]
+            model.A.remove(idx)
+        del model.need[j]
+        del model.urg[j]
+        model.J.remove(j)
+
+    def _rebuild_shared(self):
+        """Refaz C1 e o objetivo, que somam sobre todos os candidatos."""
+        model = self.model
+        h = self.tau / 60.0
+
+        for i, k in self.connectors:
+            if self.candidates:
+                model.c1[i, k] = sum(model.x[i, k, j] for j in self.candidates) <= 1
+            elif (i, k) in model.c1:
+                del model.c1[i, k]
+
+        f_sched = sum(model.x[idx] for idx in model.A)
+        delivered = sum(model.q[idx] * h for idx in model.A)
+        f_urg = model.urg_rest + sum(
+            model.urg[j] * (1 - sum(model.x[i, k, j] for i, k in self.connectors))
+            for j in self.candidates
+        )
+
+        model.obj.set_value(
+            model.price * delivered +
+            model.zeta[0] +
+            model.zeta[1] * f_sched +
+            model.zeta[2] * (len(self.connectors) - f_sched) +
+            model.zeta[3] * (model.total_dem - delivered) +
+            model.zeta[4] * f_urg +
+            model.zeta[5] * model.f_time
+        )
+
+    def _sync(self, evs):
+        # Como no modelo original, IDs repetidos viram um único candidato.
+        wanted = []
+        seen = set()
+        for ev in evs:
+            if ev.current_energy_needed > 0.001 and ev.id not in seen:
+                wanted.append(ev.id)
+                seen.add(ev.id)
+
+        if wanted == self.candidates:
+            return
+
+        current = set(self.candidates)
+        for j in self.candidates:
+            if j not in seen:
+                self._remove_ev(j)
+        for j in wanted:
+            if j not in current:
+                self._add_ev(j)
+        self.candidates = wanted
+        self._rebuild_shared()
+
+    # --- Resolução ---
+
+    def solve(self, evs, current_epoch, energy_price, zetas, time_limit=None, mip_gap=None,
+              return_status=False, constants=None):
+        """Mesma entrada/saída de solve_decision_model (sem `chargers`)."""
+        import pyomo.environ as pyo
+
+        start = time.perf_counter()
+        METRICS.count('solver.calls')
+        with METRICS.phase('solver.sync'):
+            self._sync(evs)
+        if not self.candidates:
+            return ([], 0.0, 'optimal') if return_status else ([], 0.0)
+
+        model = self.model
+        model.price = energy_price
+        for f in range(6):
+            model.zeta[f] = zetas[f]
+        urg = dict.fromkeys(self.candidates, 0.0)
+        urg_rest = 0.0
+        for ev in evs:
+            if ev.departure_time > current_epoch:
+                u = 1.0 / (ev.departure_time - current_epoch)
+                if ev.id in urg:
+                    urg[ev.id] += u
+                else:
+                    urg_rest += u
+        if constants is not None:
+            model.f_time = constants['time']
+            model.total_dem = constants['total_need']
+            model.urg_rest = constants['total_urgency'] - sum(urg.values())
+        else:
+            model.f_time = (current_epoch * self.tau) / (96 * self.tau)
+            model.total_dem = sum(ev.current_energy_needed for ev in evs)
+            model.urg_rest = urg_rest
+
+        need = {}
+        for ev in evs:
+            need.setdefault(ev.id, ev.current_energy_needed)
+        for j in self.candidates:
+            model.need[j] = need[j]
+            model.urg[j] = urg[j]
+
+        METRICS.count('solver.variables', 2 * len(model.A))
+        with METRICS.phase('solver.glpk'):
+            remaining = _remaining(time_limit, start)
+            if self.warm_start:
+                status = _run_solver(self.solver, model, remaining, mip_gap, warmstart=True)
+            else:
+                status = _run_solver(self.solver, model, remaining, mip_gap)
+
+        t0 = METRICS.clock()
+        decisions = []
+        for i, k in self.connectors:
+            for j in self.candidates:
+                if pyo.value(model.x[i, k, j]) > 0.5:
+                    decisions.append({
+                        'charger_id': i, 'connector_id': k, 'ev_id': j,
+                        'charge_rate': pyo.value(model.q[i, k, j])
+                    })
+        METRICS.stop('solver.extract', t0)
+
+        obj = pyo.value(model.obj)
+        return (decisions, obj, status) if return_status else (decisions, obj)
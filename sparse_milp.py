@@ -0,0 +1,272 @@
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+from scipy import sparse
+
+from assignment import constant_terms, ev_terms, prune_dominated
+from classes import EV, Charger
+
+# ==========================================
+# MILP ESPARSO EM PROCESSO (SCIPY / HIGHS)
+# ==========================================
+# Monta o modelo de decisão direto em arrays NumPy e numa matriz esparsa
+# SciPy, sem Pyomo, arquivo LP ou processo glpsol. Variáveis em blocos:
+#     z = [x_0 .. x_{n-1}, q_0 .. q_{n-1}],  par p = s*J + j
+# com s o "slot" (conector físico no modelo completo, carregador no
+# reduzido) e j o VE candidato. Linhas da matriz:
+#     C1  soma_j x[s,j] <= capacidade do slot
+#     C2  soma_s x[s,j] <= 1
+#     C3  q[s,j] - P_s x[s,j] <= 0
+#     C5  soma q <= grid_limit (opcional)
+# e a C4 (q*tau/60 <= demanda) vira limite superior de q. O objetivo é o
+# mesmo de solve_decision_model: constante + soma dos coeficientes por par.
+
+MATHPROG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "MathProd")
+
+
+class SparseDecisionModel:
+    """Arrays do MILP de uma época e a tradução da solução para decisões."""
+
+    def __init__(self, evs, chargers, current_epoch, energy_price, zetas, tau=15,
+                 formulation='full', grid_limit=None, constants=None):
+        h = tau / 60.0
+        need, urg, cands = ev_terms(evs, current_epoch)
+        n_conn = sum(c.num_connectors for c in chargers)
+        if formulation == 'full':
+            self.slots = [(c, k) for c in chargers for k in range(c.num_connectors)]
+            capacity = np.ones(len(self.slots))
+        elif formulation == 'reduced':
+            self.slots = [(c, None) for c in chargers if c.num_connectors > 0]
+            capacity = np.array([float(c.num_connectors) for c, _ in self.slots])
+        else:
+            raise ValueError(f"Formulação desconhecida: {formulation}")
+        self.formulation = formulation
+        self.cands = prune_dominated(cands, need, urg, n_conn, energy_price, zetas) if n_conn else []
+
+        S, J = len(self.slots), len(self.cands)
+        n = S * J
+        self.n_pairs = n
+        if n == 0:
+            return
+
+        # Mesma constante de assignment.solve_assignment (nenhum VE conectado)
+        _, total_dem, total_urg, f_time = constant_terms(evs, urg, chargers, current_epoch, tau,
+                                                         constants)
+        self.constant = (zetas[0] +
+                         zetas[2] * n_conn +
+                         zetas[3] * total_dem +
+                         zetas[4] * total_urg +
+                         zetas[5] * f_time)
+
+        cand_need = np.array([need[j] for j in self.cands])
+        cand_urg = np.array([urg[j] for j in self.cands])
+        power = np.array([c.max_power for c, _ in self.slots])
+
+        self.c = np.concatenate([
+            np.tile(zetas[1] - zetas[2] - zetas[4] * cand_urg, S),
+            np.full(n, (energy_price - zetas[3]) * h),
+        ])
+        self.integrality = np.concatenate([np.ones(n), np.zeros(n)])
+        self.lb = np.zeros(2 * n)
+        self.ub = np.concatenate([np.ones(n),
+                                  np.minimum(power[:, None], cand_need[None, :] / h).ravel()])
+
+        pair = np.arange(n)
+        slot_of = pair // J
+        ev_of = pair % J
+        rows = [slot_of,               # C1
+                S + ev_of,             # C2
+                S + J + pair,          # C3: q
+                S + J + pair]          # C3: x
+        cols = [pair, pair, n + pair, pair]
+        vals = [np.ones(n), np.ones(n), np.ones(n), -power[slot_of]]
+        row_ub = [capacity, np.ones(J), np.zeros(n)]
+        if grid_limit is not None:
+            rows.append(np.full(n, S + J + n))
+            cols.append(n + pair)
+            vals.append(np.ones(n))
+            row_ub.append([grid_limit])
+        self.row_ub = np.concatenate(row_ub)
+        self.A = sparse.csr_array((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                                  shape=(len(self.row_ub), 2 * n))
+
+    def objective(self, z):
+        return float(self.constant + self.c @ z)
+
+    def decode(self, z):
+        """Decisões no formato de solve_decision_model (ordem carregador, conector, VE)."""
+        n, J = self.n_pairs, len(self.cands)
+        decisions = []
+        used = {}
+        for p in np.flatnonzero(z[:n] > 0.5):
+            s, j = divmod(int(p), J)
+            charger, k = self.slots[s]
+            if k is None:
+                # Modelo reduzido: conectores numerados na ordem dos VEs
+                k = used.get(s, 0)
+                used[s] = k + 1
+            decisions.append({
+                'charger_id': charger.id, 'connector_id': k, 'ev_id': self.cands[j],
+                'charge_rate': float(z[n + p])
+            })
+        return decisions
+
+
+# ==========================================
+# PARIDADE COM PYOMO/GLPK E COM O MODELO MATHPROG
+# ==========================================
+
+def load_mathprog_instance(data_path=os.path.join(MATHPROG_DIR, "dados.dat"), tau=15):
+    """
+    Lê a instância de referência do adp_model.mod (formato do dados.dat).
+    Retorna (evs, chargers, época, preço, zetas); a partida de cada VE sai
+    da urgência 1/(partida - época).
+    """
+    with open(data_path, 'r') as f:
+        text = re.sub(r'#[^\n]*', '', f.read())
+
+    sets, params = {}, {}
+    for stmt in text.split(';'):
+        tokens = stmt.split()
+        if len(tokens) < 3 or ':=' not in tokens:
+            continue
+        split = tokens.index(':=')
+        head, values = tokens[:split], tokens[split + 1:]
+        if head[0] == 'set':
+            sets[head[1]] = values
+        elif head[0] == 'param:':   # Tabela: chave seguida de uma coluna por parâmetro
+            names = head[1:]
+            width = len(names) + 1
+            for r in range(0, len(values), width):
+                for name, v in zip(names, values[r + 1:r + width]):
+                    params.setdefault(name, {})[values[r]] = float(v)
+        elif len(values) == 1:
+            params[head[1]] = float(values[0])
+        else:
+            params[head[1]] = {values[r]: float(values[r + 1]) for r in range(0, len(values), 2)}
+
+    epoch = int(round(params['CurrentTimeFeature'] / tau))
+    chargers = [Charger(int(i), params['MaxPower'][i], len(sets[f'CONNECTORS[{i}]']),
+                        params['MaxPower'][i] >= 50.0) for i in sets['CHARGERS']]
+    evs = []
+    for j in sets['EVS']:
+        need = params['EnergyNeeded'][j]
+        departure = epoch + int(round(1.0 / params['UrgencyScore'][j]))
+        evs.append(EV(int(j), 0, departure, need, need))
+    zetas = np.array([params['Zeta'][str(f)] for f in range(6)])
+    return evs, chargers, epoch, params['EnergyPrice'], zetas
+
+
+def mathprog_objective(solution_path=os.path.join(MATHPROG_DIR, "solution.sol")):
+    """Objetivo gravado pelo glpsol no solution.sol (None se não houver)."""
+    try:
+        with open(solution_path, 'r') as f:
+            match = re.search(r'Objective:\s*\S+\s*=\s*(\S+)', f.read())
+    except OSError:
+        return None
+    return float(match.group(1)) if match else None
+
+
+def glpk_available():
+    """True se o Pyomo e o glpsol estão instalados (sem eles a paridade com GLPK é pulada)."""
+    try:
+        import pyomo.environ as pyo
+    except ImportError:
+        return False
+    return bool(pyo.SolverFactory('glpk').available(exception_flag=False))
+
+
+def _rel_diff(a, b):
+    return abs(a - b) / max(1.0, abs(b))
+
+
+def check_parity(n_instances=30, size=(4, 2, 0.5, 40), methods=('milp', 'reduced'),
+                 grid_limit=None, seed=0, tol=1e-6):
+    """
+    Compara o backend 'highs' com o 'pyomo' (GLPK) e com o método 'fast'
+    (atribuição exata, sem grid_limit) em instâncias do benchmark sintético,
+    e com o solution.sol na instância MathProg de referência. Sem glpsol, a
+    comparação com o Pyomo é pulada. Retorna um resumo com os maiores
+    desvios de objetivo, os tempos médios por backend e 'ok'.
+    """
+    from benchmark import BENCH_ZETAS, SyntheticSite
+    from main import HORIZON, PRICES, TAU
+    from solver import solve_decision_model
+
+    backends = ('pyomo', 'highs') if glpk_available() else ('highs',)
+    compare_fast = grid_limit is None
+
+    evs, chargers, epoch, price, zetas = load_mathprog_instance(tau=TAU)
+    reference = {'mathprog': mathprog_objective()}
+    for backend in backends:
+        _, reference[backend] = solve_decision_model(evs, chargers, epoch, price, zetas, TAU,
+                                                     backend=backend)
+    _, reference['fast'] = solve_decision_model(evs, chargers, epoch, price, zetas, TAU, method='fast')
+    checks = [_rel_diff(reference['highs'], reference['fast']) <= tol]
+    if 'pyomo' in reference:
+        checks.append(_rel_diff(reference['highs'], reference['pyomo']) <= tol)
+    if reference['mathprog'] is not None:
+        # O solution.sol grava o objetivo com duas casas decimais.
+        checks.append(abs(reference['highs'] - reference['mathprog']) <= 0.005)
+
+    site = SyntheticSite(*size, seed=seed)
+    states = [(int(t),) + site.snapshot(int(t)) for t in site.rng.integers(0, HORIZON - 1, n_instances)]
+    report = {'glpk': 'pyomo' in backends, 'reference': reference, 'methods': {}}
+    for method in methods:
+        times = dict.fromkeys(backends, 0.0)
+        worst = {'pyomo': 0.0, 'fast': 0.0}
+        for t, evs, chargers in states:
+            objs = {}
+            for backend in backends:
+                start = time.perf_counter()
+                _, objs[backend] = solve_decision_model(evs, chargers, t, PRICES[t], BENCH_ZETAS,
+                                                        TAU, method=method, grid_limit=grid_limit,
+                                                        backend=backend)
+                times[backend] += time.perf_counter() - start
+            if compare_fast:
+                _, objs['fast'] = solve_decision_model(evs, chargers, t, PRICES[t], BENCH_ZETAS,
+                                                       TAU, method='fast')
+            for other in worst:
+                if other in objs:
+                    worst[other] = max(worst[other], _rel_diff(objs['highs'], objs[other]))
+        result = {
+            'max_rel_diff': float(worst['pyomo']) if 'pyomo' in backends else None,
+            'max_rel_diff_fast': float(worst['fast']) if compare_fast else None,
+            'highs_ms': times['highs'] / len(states) * 1e3,
+            'pyomo_ms': times['pyomo'] / len(states) * 1e3 if 'pyomo' in backends else None,
+        }
+        result['ok'] = bool(all(d is None or d <= tol
+                                for d in (result['max_rel_diff'], result['max_rel_diff_fast'])))
+        report['methods'][method] = result
+        checks.append(result['ok'])
+    report['ok'] = all(checks)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paridade do backend HiGHS com Pyomo/GLPK e com o método 'fast'")
+    parser.add_argument("--instances", type=int, default=30)
+    parser.add_argument("--chargers", type=int, default=4)
+    parser.add_argument("--connectors", type=int, default=2)
+    parser.add_argument("--level3", type=float, default=0.5)
+    parser.add_argument("--evs-per-day", type=int, default=40)
+    parser.add_argument("--grid-limit", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = check_parity(args.instances, (args.chargers, args.connectors, args.level3, args.evs_per_day),
+                          grid_limit=args.grid_limit, seed=args.seed)
+    if not report['glpk']:
+        print("Aviso: GLPK (glpsol) indisponível; comparação com o Pyomo pulada")
+    fmt = lambda v, spec: format(v, spec) if v is not None else "-"
+    ref = report['reference']
+    print(f"Instância MathProg: glpsol {fmt(ref['mathprog'], '.4f')} | pyomo {fmt(ref.get('pyomo'), '.4f')} | "
+          f"highs {ref['highs']:.4f} | fast {ref['fast']:.4f}")
+    for method, m in report['methods'].items():
+        print(f"{method:<8} desvio máx: pyomo {fmt(m['max_rel_diff'], '.2e')} | fast {fmt(m['max_rel_diff_fast'], '.2e')} | "
+              f"pyomo {fmt(m['pyomo_ms'], '.1f')} ms | highs {m['highs_ms']:.1f} ms")
+    print("Paridade OK" if report['ok'] else "Aviso: backends divergem")
+    raise SystemExit(0 if report['ok'] else 1)